@@ -0,0 +1,128 @@
+import csv
+import time
+import argparse
+import numpy as np
+from pcap_features import HASHES, FEATURES, FlowTable, read_pcap
+
+import leo_path
+from leo_ctrlplane_generator import build_tree_from_file
+from leo_quantization import load_quantization, quantize_tree, quantize_columns
+
+DEFAULT_SLOTS = '65536,131072,262144,524288,1048576,2097152,4194304'
+
+def macro_f1(confusion):
+	# Rows are the reference classes and columns the predictions, classes neither holds are left out
+	tp = np.diag(confusion).astype(np.float64)
+	total = confusion.sum(axis=0) + confusion.sum(axis=1)
+	present = total > 0
+	if not present.any():
+		return 1.0
+	return float(np.mean(2 * tp[present] / total[present]))
+
+def register_bits(table, register_width):
+	# The registers a switch needs per slot: the features, and the timestamps, direction and tag
+	# they depend on. The packet counter only numbers the output rows.
+	names = [name for name in table.registers if name != '_packets' and (table.evict or name != '_tag')]
+	return len(names) * register_width
+
+def tree_inputs(snapshots, features, quantizations):
+	X = np.stack([snapshots[name] for name in features], axis=1)
+	if quantizations is not None:
+		X = quantize_columns(X, features, quantizations)
+	return X
+
+def simulate(filenames, tree, quantizations, slot_counts, hashes, evict, timeout, batch_size):
+	# Replays the trace once through a table without collisions and through every (hash, slots) table.
+	# Each table is scored on how often the tree decides as it does with the collision-free features.
+	features = tree.feature_names
+	reference = FlowTable(1 << 16, features, 'exact', False, timeout)
+	tables = [(h, s, FlowTable(s, features, h, evict, timeout)) for h in hashes for s in slot_counts]
+	classes = np.unique(tree.label[tree.left == -1])
+	C = len(classes)
+	confusion = [np.zeros((C, C), dtype=np.int64) for t in tables]
+	corrupted = [0] * len(tables)
+	packets = 0
+
+	for filename in filenames:
+		for batch in read_pcap(filename, batch_size):
+			clean = reference.update(batch)
+			clean_X = np.stack([clean[name] for name in features], axis=1)
+			expected = np.searchsorted(classes, tree.predict(tree_inputs(clean, features, quantizations)))
+			for i, (h, s, table) in enumerate(tables):
+				snapshots = table.update(batch)
+				X = np.stack([snapshots[name] for name in features], axis=1)
+				corrupted[i] += int(np.count_nonzero((X != clean_X).any(axis=1)))
+				predicted = np.searchsorted(classes, tree.predict(tree_inputs(snapshots, features, quantizations)))
+				confusion[i] += np.bincount(expected * C + predicted, minlength=C * C).reshape(C, C)
+			packets += len(batch['ts'])
+
+	results = []
+	for (h, s, table), c, bad in zip(tables, confusion, corrupted):
+		results.append({'hash' : h, 'slots' : s, 'table' : table, 'corrupted' : bad / max(packets, 1),
+			'agreement' : np.trace(c) / max(packets, 1), 'macro_f1' : macro_f1(c)})
+	return results, packets, len(reference.flow_ids)
+
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program replays pcaps through hash-indexed register arrays of several sizes and reports how flow collisions change the decisions of a trained tree.')
+
+	parser.add_argument('--pcap_filenames', type=str, required=True, help='Comma-separated pcap files, read in order as one trace.')
+	parser.add_argument('--input_filename', type=str, required=True, help='The decision tree exported by scikit-learn\'s export_text(...), on features of pcap_features.py.')
+	parser.add_argument('--quantization', type=str, help='Feature quantization learned during training, applied to the features before the tree.')
+	parser.add_argument('--slots', type=str, default=DEFAULT_SLOTS, help='Comma-separated register sizes to simulate (Default: ' + DEFAULT_SLOTS + ').')
+	parser.add_argument('--hashes', type=str, default='crc32', help='Comma-separated hashes that index the registers, out of ' + ', '.join(sorted(HASHES)) + ' (Default: crc32).')
+	parser.add_argument('--evict', action='store_true', help='Keep a flow tag per slot and restart the slot for another flow, instead of sharing it.')
+	parser.add_argument('--timeout', type=float, default=0, help='Seconds without packets after which a slot starts a new flow (Default: 0 = never).')
+	parser.add_argument('--register_width', type=int, default=16, help='Bits per register, for the memory of every size (Default: 16).')
+	parser.add_argument('--tolerance', type=float, default=0.01, help='Largest macro F1 loss accepted, against the decisions without collisions (Default: 0.01).')
+	parser.add_argument('--batch_size', type=int, default=1 << 20, help='Packets per vectorized batch (Default: 1048576).')
+	parser.add_argument('--results_filename', type=str, help='Optional CSV of the results.')
+	args = parser.parse_args()
+
+	slot_counts = sorted(int(s) for s in args.slots.split(','))
+	hashes = args.hashes.split(',')
+	for h in hashes:
+		if h not in HASHES:
+			parser.error('unknown hash ' + h)
+		if slot_counts[-1] > 1 << HASHES[h][1]:
+			print('Warning:', h, 'only indexes', 1 << HASHES[h][1], 'slots, the larger registers behave like that size')
+
+	tree = build_tree_from_file(args.input_filename)
+	unknown = [name for name in tree.feature_names if name not in FEATURES]
+	if len(unknown) > 0:
+		parser.error('the tree uses features pcap_features.py cannot compute: ' + ', '.join(unknown))
+	quantizations = None
+	if args.quantization is not None:
+		quantizations = load_quantization(args.quantization)['features']
+		quantize_tree(tree, quantizations)
+
+	start = time.perf_counter()
+	results, packets, flows = simulate(args.pcap_filenames.split(','), tree, quantizations, slot_counts, hashes,
+		args.evict, int(args.timeout * 1000000), args.batch_size)
+	elapsed = time.perf_counter() - start
+	print('Packets:', packets, '| Flows:', flows, '| Features:', ', '.join(tree.feature_names), '| Time (s): {:.1f}'.format(elapsed))
+
+	print('{:>8}  {:>10}  {:>12}  {:>14}  {:>12}  {:>10}'.format('Hash', 'Slots', 'Memory (MB)', 'Corrupted (%)', 'Agreement (%)', 'Macro F1'))
+	rows = []
+	for r in results:
+		r['memory'] = r['slots'] * register_bits(r['table'], args.register_width) / 8 / 2 ** 20
+		print('{:>8}  {:>10}  {:>12.2f}  {:>14.3f}  {:>12.3f}  {:>10.4f}'.format(r['hash'], r['slots'], r['memory'], 100 * r['corrupted'], 100 * r['agreement'], r['macro_f1']))
+		rows.append([r['hash'], r['slots'], r['memory'], r['corrupted'], r['agreement'], r['macro_f1']])
+
+	for h in hashes:
+		fits = [r for r in results if r['hash'] == h and r['macro_f1'] >= 1 - args.tolerance]
+		if len(fits) == 0:
+			print('Error: No', h, 'register size keeps the macro F1 loss within', args.tolerance)
+		else:
+			best = min(fits, key=lambda r: r['slots'])
+			print('Smallest', h, 'registers within', args.tolerance, 'macro F1:', best['slots'], 'slots ({:.2f} MB)'.format(best['memory']))
+
+	if args.results_filename is not None:
+		f = open(args.results_filename, 'w', newline='')
+		writer = csv.writer(f)
+		writer.writerow(['Hash', 'Slots', 'Memory (MB)', 'Corrupted', 'Agreement', 'Macro F1'])
+		writer.writerows(rows)
+		f.close()
+
+if __name__ == '__main__':
+	main()
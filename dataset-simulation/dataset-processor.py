@@ -0,0 +1,315 @@
+import re
+import os
+import csv
+import json
+import argparse
+import functools
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from subprocess import call
+from sklearn.preprocessing import LabelEncoder
+from sklearn.tree import DecisionTreeClassifier, export_graphviz, export_text
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import confusion_matrix, f1_score
+from sklearn.inspection import permutation_importance
+from statistics import median, mean
+from dataset_cache import load_cached_dataset, cached_fingerprint
+from feature_selection import STRATEGIES, SelectionCache, select_features
+from leo_training import load_leo_target, fit_for_leo, quantize_for_leo
+from experiment_runner import run_experiments
+
+def load_spec(filename):
+	f = open(filename)
+	if filename.endswith('.yaml') or filename.endswith('.yml'):
+		try:
+			import yaml
+		except ImportError:
+			raise SystemExit('Reading ' + filename + ' requires PyYAML (pip install pyyaml), or use a JSON spec.')
+		spec = yaml.safe_load(f)
+	else:
+		spec = json.load(f)
+	f.close()
+	return spec
+
+def dataset_cache_dir(spec):
+	return os.path.join(spec['folder'], '.cache', spec['name'])
+
+def column_name(spec, raw_name):
+	if spec['remove_spaces_from_columns']:
+		return raw_name.replace(' ', '')
+	return raw_name
+
+def make_cleaner(spec, sample, seed):
+	# Rows are sampled with one generator across all files and chunks, so the sample does not depend on the chunk size
+	rng = np.random.RandomState(seed)
+
+	def clean_dataset(dataset):
+		if sample < 1:
+			dataset = dataset[rng.random_sample(len(dataset)) < sample]
+
+		# Removing space from labels
+		dataset.columns = [column_name(spec, col) for col in dataset.columns]
+		label = spec['label_column']
+
+		if spec['clean_labels']:
+			# Removing non-alphabetic characters and cleaning up double-spaces
+			old_labels = dataset[label].unique()
+			new_labels = []
+			for old_label in old_labels:
+				new_label = re.sub('[^a-zA-Z ]+', '', old_label)
+				new_label = re.sub('\\s', '_', new_label)
+				new_label = new_label.replace('__', '_')
+				new_labels.append(new_label)
+
+			dataset[label] = dataset[label].replace(dict(zip(old_labels, new_labels)))
+
+		# Removing rows with missing data and rows with infinite data
+		dataset = dataset.replace([np.inf, -np.inf], np.nan)
+		dataset = dataset.dropna()
+		return dataset
+
+	return clean_dataset
+
+def read_and_clean_dataset(spec, chunksize, sample, seed, switch_features_only):
+	# Column types and the optional column subset are given under the raw CSV names
+	raw_columns = pd.read_csv(os.path.join(spec['folder'], spec['files'][0]), nrows=0).columns
+	dtype = {col : str for col in raw_columns if column_name(spec, col) in spec['string_columns']}
+	usecols = None
+	if switch_features_only:
+		wanted = spec['switch_features'] + [spec['label_column']]
+		usecols = [col for col in raw_columns if column_name(spec, col) in wanted]
+
+	# Everything that changes the cleaned rows is part of the cache fingerprint, the chunk size is not
+	config = {key : spec[key] for key in ['remove_spaces_from_columns', 'label_column', 'clean_labels', 'string_columns']}
+	config.update({'sample' : sample, 'seed' : seed, 'usecols' : usecols})
+
+	return load_cached_dataset(spec['folder'], spec['files'], make_cleaner(spec, sample, seed),
+		dtype=dtype, usecols=usecols, chunksize=chunksize, cache_dir=dataset_cache_dir(spec), config=config)
+
+def preprocess_dataset(dataset, spec, use_switch_features, bin_threshold):
+	# The dataset is shared by the experiments and left untouched, only the kept columns are copied
+	label = spec['label_column']
+	benign = spec['benign_label']
+
+	# Keeping some columns only, the label is always the last column
+	features = [col for col in dataset.columns if col != label and col not in spec['drop_columns']]
+	if use_switch_features:
+		features = [col for col in features if col in spec['switch_features']]
+
+	labels = dataset[label]
+	if bin_threshold == -1:
+		labels = labels.where(labels == benign, 'MALICIOUS')
+	else:
+		counts = labels.value_counts()
+		low_count_classes = counts[counts < bin_threshold]
+		low_count_classes = low_count_classes.index.ravel()
+		labels = labels.mask(labels.isin(low_count_classes), 'OtherMalicious')
+
+	return dataset[features].assign(**{label : labels})
+
+def plot_feature_importance_mdi(model, features, filename):
+	importances = pd.DataFrame({'feature' : features, 'importance' : model.feature_importances_})
+	importances = importances.sort_values('importance', ascending=False).set_index('feature')
+	plt.rcParams['figure.figsize'] = (15, 5)
+	fig, ax = plt.subplots()
+	importances.plot.bar(ax=ax)
+	ax.set_title("Feature importances using MDI")
+	ax.set_ylabel("Mean decrease in impurity")
+	fig.tight_layout()
+	plt.savefig(filename + 'mdi.pdf', bbox_inches='tight')
+	plt.close()
+
+def plot_permutation_importance(model, X_test, y_test, features, filename):
+	result = permutation_importance(model, X_test, y_test, n_repeats=10, random_state=42, n_jobs=2)
+	importances = pd.DataFrame({'feature':features, 'importance' : result.importances_mean})
+	importances = importances.sort_values('importance', ascending=False).set_index('feature')
+	plt.rcParams['figure.figsize'] = (10, 5)
+	fig, ax = plt.subplots()
+	importances.plot.bar(ax=ax)
+	ax.set_title("Feature importances using permutation on full model")
+	ax.set_ylabel("Mean accuracy decrease")
+	fig.tight_layout()
+	plt.savefig(filename + 'permutation.pdf', bbox_inches='tight')
+	plt.close()
+
+def run_experiment(spec, selection, selection_cache, leo, quantize_width, split_seed, cleaned_dataset, exp):
+	# Training random forest tree
+	filename = 'D' + str(exp[0]) + '-L' + str(exp[1]) + '-F' + str(exp[2]) + '-SWITCHFEATURES' + str(exp[3])
+	# Experiments run in parallel, so the log is printed by main in experiment order
+	log = [filename]
+
+	dataset = preprocess_dataset(cleaned_dataset, spec, exp[3], exp[4])
+	label = spec['label_column']
+
+	log.append('Shape: ' + str(dataset.shape))
+	log.append(str(dataset[label].value_counts()))
+	num_classes = len(dataset[label].unique())
+	features = dataset.columns.tolist()[:-1]
+	
+	# Encoding labels
+	labelencoder = LabelEncoder()
+	y = labelencoder.fit_transform(dataset[label])
+	dataset = dataset.drop([label], axis=1).values
+
+	# Splitting up train and test sets, seeded so that a cached feature selection was fitted on this split's training rows
+	X_train, X_test, y_train, y_test = train_test_split(dataset, y, train_size = 0.75, test_size = 0.25, stratify = y, random_state = split_seed)
+
+	model = DecisionTreeClassifier(max_depth=exp[0], max_leaf_nodes=exp[1], criterion='entropy', class_weight='balanced')
+
+	map, features = select_features(exp[2], X_train, y_train, features, selection, selection_cache, [exp[3], exp[4]], split_seed, model)
+	X_train = pd.DataFrame(X_train)
+	X_test = pd.DataFrame(X_test)
+	X_train = X_train.iloc[:, map]
+	X_test = X_test.iloc[:, map]
+
+	if leo is None:
+		model.fit(X_train, y_train)
+	else:
+		# Shrinks the leaf budget until the rules fit the target data plane
+		model, leaves = fit_for_leo(model, X_train, y_train, features, leo)
+		log.append('Leo: fits the data plane with at most ' + str(leaves) + ' leaves (' + str(model.get_n_leaves()) + ' used)')
+
+	# plot_feature_importance_mdi(model, features, filename)
+	# plot_permutation_importance(model, X_test, y_test, features, filename)
+	# return
+
+	y_predict = model.predict(X_test)
+	y_train_predict = model.predict(X_train)
+	cm_test = confusion_matrix(y_test, y_predict)
+	cm_train = confusion_matrix(y_train, y_train_predict)
+	cm_test = cm_test.tolist()
+	cm_train = cm_train.tolist()
+
+	class_f1 = f1_score(y_test, y_predict, average=None)
+	macro_f1 = f1_score(y_test, y_predict, average='macro')
+	box = {
+		'label' : 'Depth ' + str(exp[0]) + '\nLeaves ' + str(exp[1]) + '\nFeatures ' + str(exp[2]),
+		'whislo': min(class_f1),
+		'q1'    : min(class_f1),
+		'med'   : median(class_f1),
+		'q3'    : max(class_f1),
+		'whishi': max(class_f1),
+		'mean' : mean(class_f1),
+		'fliers': []
+	}
+	log.append('Test set - Macro F1 ' + str(macro_f1))
+
+	quantized_f1 = None
+	if quantize_width is not None:
+		# Labels are encoded integers, so the quantized tree predicts the same classes
+		out_filename = spec['results_dir'] + '/' + filename
+		y_quantized = quantize_for_leo(model, X_train, X_test, features, quantize_width, out_filename + '.quantization.json')
+		quantized_f1 = f1_score(y_test, y_quantized, average='macro')
+		log.append('Test set - Macro F1 with ' + str(quantize_width) + '-bit features ' + str(quantized_f1) + ' (loss ' + str(macro_f1 - quantized_f1) + ')')
+
+	lab = labelencoder.inverse_transform([x for x in range(num_classes)])
+	lab = lab.tolist()
+	for i in range(len(cm_test)):
+		cm_test[i].insert(0, 'Actual-' + lab[i])
+		cm_train[i].insert(0, 'Actual-' + lab[i])
+
+	lab.insert(0, 'Predicted-->')
+
+	csv_rows = []
+	csv_rows.append([filename])
+	csv_rows.append([len(features)] + features)
+	csv_rows.append(lab)
+	csv_rows.extend(cm_test)
+	csv_rows.append(['F1 score'] + class_f1.tolist() + [macro_f1])
+	if quantized_f1 is not None:
+		csv_rows.append(['Quantized macro F1', quantized_f1, 'Loss', macro_f1 - quantized_f1])
+	csv_rows.append(lab)
+	csv_rows.extend(cm_train)
+	csv_rows.append(['========================================='])
+
+	# Every experiment writes its own tree plot, only the shared result files are left to main
+	out_filename = spec['results_dir'] + '/' + os.path.split(filename)[-1].split('.')[0]
+	dot_filename = out_filename + '.dot'
+	export_graphviz(model, out_file=dot_filename,  class_names=labelencoder.inverse_transform([x for x in range(num_classes)]), feature_names=features, proportion = True)
+	call(['dot', '-Tpdf', dot_filename, '-o', out_filename + '.pdf'])
+	call(['rm', dot_filename])
+	text = filename + '\n' + export_text(model, feature_names=features) + '=========================================\n'
+
+	return {'log' : log, 'csv_rows' : csv_rows, 'text' : text, 'box' : box}
+
+def number(value):
+	if value.isdigit():
+		return int(value)
+	return float(value)
+
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program trains and evaluates the decision tree for every experiment of a dataset spec.')
+	parser.add_argument('--spec', type=str, required=True, help='The JSON (or YAML) dataset spec, e.g. specs/cicids2017.json.')
+	parser.add_argument('--workers', type=int, default=os.cpu_count(), help='The number of experiments to run in parallel.')
+	parser.add_argument('--chunksize', type=int, help='Read the CSVs in chunks of this many rows, cleaning each chunk as it is read (Default: the spec, otherwise whole files).')
+	parser.add_argument('--sample', type=float, help='Fraction of the rows to keep, sampled while reading (Default: the spec, otherwise 1).')
+	parser.add_argument('--seed', type=int, help='Seed of the row sampling (Default: the spec, otherwise 0).')
+	parser.add_argument('--split_seed', type=int, help='Seed of the train/test split of every experiment, cached feature selections are only reused on the same split (Default: the spec, otherwise 0).')
+	parser.add_argument('--selection', type=str, choices=STRATEGIES, help='Feature selection strategy: recursive feature elimination, importance-based pruning or mutual information (Default: the spec, otherwise rfe).')
+	parser.add_argument('--selection_step', type=number, help='Features removed per RFE iteration, or a fraction of the remaining features if below 1 (Default: the spec, otherwise 1).')
+	parser.add_argument('--selection_sample', type=float, help='Fraction of the training rows used for feature selection (Default: the spec, otherwise 1).')
+	parser.add_argument('--mi_prefilter', type=int, help='Keep only this many features by mutual information before the selection strategy runs (Default: the spec, otherwise 0 = off).')
+	parser.add_argument('--shared_ranking', action='store_true', help='Rank the features with one unlimited tree shared by all experiments instead of each experiment\'s tree, so that experiments with the same feature count reuse a selection (Default: the spec, otherwise off).')
+	parser.add_argument('--no_selection_cache', action='store_true', help='Run feature selection for every experiment instead of reusing earlier selections.')
+	parser.add_argument('--leo_manifest', type=str, help='Manifest of a generated Leo data plane. Every tree is trained to fit its tables (Default: the spec, otherwise no hardware constraint).')
+	parser.add_argument('--quantize_width', type=int, help='Learn a quantization of the features to this many bits (the data plane uses 16), report the F1 score it loses and write it next to each tree (Default: the spec, otherwise off).')
+	parser.add_argument('--switch_features_only', action='store_true', help='Only read the switch features and the label, missing values in other columns no longer drop a row.')
+	args = parser.parse_args()
+
+	spec = load_spec(args.spec)
+	chunksize = args.chunksize if args.chunksize is not None else spec.get('chunksize')
+	sample = args.sample if args.sample is not None else spec.get('sample', 1)
+	seed = args.seed if args.seed is not None else spec.get('seed', 0)
+	split_seed = args.split_seed if args.split_seed is not None else spec.get('split_seed', 0)
+	switch_features_only = args.switch_features_only or spec.get('switch_features_only', False)
+
+	selection = dict(spec.get('feature_selection', {}))
+	for key, value in [('strategy', args.selection), ('step', args.selection_step), ('sample', args.selection_sample), ('mi_prefilter', args.mi_prefilter)]:
+		if value is not None:
+			selection[key] = value
+	if args.shared_ranking:
+		selection['shared_ranking'] = True
+
+	experiments = [tuple(exp) for exp in spec['experiments']]
+	if switch_features_only and not all(exp[3] for exp in experiments):
+		parser.error('--switch_features_only needs every experiment to use the switch features')
+
+	os.mkdir(spec['results_dir'])
+
+	# Parsed once and shared with the workers, every experiment copies only the columns it keeps
+	cleaned_dataset = read_and_clean_dataset(spec, chunksize, sample, seed, switch_features_only)
+	selection_cache = None
+	if not args.no_selection_cache:
+		cache_dir = dataset_cache_dir(spec)
+		selection_cache = SelectionCache(os.path.join(cache_dir, 'features'), cached_fingerprint(cache_dir))
+
+	leo = None
+	leo_manifest = args.leo_manifest if args.leo_manifest is not None else spec.get('leo_manifest')
+	if leo_manifest is not None:
+		leo = load_leo_target(leo_manifest)
+
+	quantize_width = args.quantize_width if args.quantize_width is not None else spec.get('quantize_width')
+	run = functools.partial(run_experiment, spec, selection, selection_cache, leo, quantize_width, split_seed)
+	results = run_experiments(cleaned_dataset, experiments, run, args.workers)
+
+	boxs = []
+	# Results come back in experiment order, whichever worker finished first
+	results_dir = spec['results_dir']
+	with open(results_dir + '/results.csv', 'w') as my_csv, open(results_dir + '/results.txt', 'w') as my_txt:
+		csvWriter = csv.writer(my_csv, delimiter=',')
+		for result in results:
+			print('\n'.join(result['log']))
+			csvWriter.writerows(result['csv_rows'])
+			my_txt.write(result['text'])
+			boxs.append(result['box'])
+
+	fig, ax = plt.subplots()
+	ax.bxp(boxs, showfliers=False, showcaps=False, showmeans=True)
+	ax.set_ylabel('F1 score')
+	plt.savefig(results_dir + '/' + spec['plot_filename'], bbox_inches='tight')
+	plt.close()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,97 @@
+import os
+import json
+import hashlib
+import inspect
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+
+def source_fingerprint(folder, filenames, clean, config=None):
+	# The cache is valid as long as the CSVs, the cleaning code and its configuration are unchanged
+	digest = hashlib.sha256()
+	digest.update(str(CACHE_VERSION).encode())
+	digest.update(inspect.getsource(clean).encode())
+	digest.update(json.dumps(config, sort_keys=True).encode())
+	for filename in filenames:
+		stat = os.stat(os.path.join(folder, filename))
+		digest.update((filename + ':' + str(stat.st_size) + ':' + str(stat.st_mtime_ns)).encode())
+	return digest.hexdigest()
+
+def write_columns(dataset, cache_dir, fingerprint):
+	os.makedirs(cache_dir, exist_ok=True)
+	manifest_path = os.path.join(cache_dir, 'manifest.json')
+	if os.path.exists(manifest_path):
+		os.remove(manifest_path)
+
+	columns = []
+	for i, name in enumerate(dataset.columns):
+		values = dataset[name]
+		column = {'name' : name, 'file' : str(i) + '.npy'}
+		if values.dtype.kind in 'biuf':
+			values = values.to_numpy()
+		else:
+			# Strings are stored as integer codes next to their distinct values
+			codes, uniques = pd.factorize(values)
+			values = codes.astype(np.int32)
+			column['categories'] = uniques.tolist()
+		np.save(os.path.join(cache_dir, column['file']), values)
+		columns.append(column)
+
+	# The manifest is written last, so an interrupted write is never mistaken for a valid cache
+	f = open(manifest_path, 'w')
+	json.dump({'fingerprint' : fingerprint, 'rows' : len(dataset), 'columns' : columns}, f)
+	f.close()
+
+def read_columns(cache_dir, fingerprint):
+	manifest_path = os.path.join(cache_dir, 'manifest.json')
+	if not os.path.exists(manifest_path):
+		return None
+
+	f = open(manifest_path)
+	manifest = json.load(f)
+	f.close()
+	if manifest['fingerprint'] != fingerprint:
+		return None
+
+	columns = {}
+	for column in manifest['columns']:
+		values = np.load(os.path.join(cache_dir, column['file']), mmap_mode='r')
+		if 'categories' in column:
+			values = np.array(column['categories'], dtype=object)[values]
+		columns[column['name']] = values
+	return pd.DataFrame(columns, copy=False)
+
+def cached_fingerprint(cache_dir):
+	manifest_path = os.path.join(cache_dir, 'manifest.json')
+	if not os.path.exists(manifest_path):
+		return None
+
+	f = open(manifest_path)
+	manifest = json.load(f)
+	f.close()
+	return manifest['fingerprint']
+
+def load_cached_dataset(folder, filenames, clean, dtype=None, usecols=None, chunksize=None, cache_dir=None, config=None):
+	# Parses the CSVs and runs clean(dataset) once, later calls memory-map one .npy file per column.
+	# With a chunksize, clean runs on every chunk so only the rows and columns it keeps stay in memory.
+	if cache_dir is None:
+		cache_dir = os.path.join(folder, '.cache')
+
+	fingerprint = source_fingerprint(folder, filenames, clean, config)
+	dataset = read_columns(cache_dir, fingerprint)
+	if dataset is not None:
+		return dataset
+
+	dataset = []
+	for filename in filenames:
+		path = os.path.join(folder, filename)
+		if chunksize is None:
+			dataset.append(clean(pd.read_csv(path, dtype=dtype, usecols=usecols, low_memory=False)))
+		else:
+			for chunk in pd.read_csv(path, dtype=dtype, usecols=usecols, chunksize=chunksize):
+				dataset.append(clean(chunk))
+
+	dataset = pd.concat(dataset, ignore_index=True)
+	write_columns(dataset, cache_dir, fingerprint)
+	return dataset
@@ -0,0 +1,248 @@
+import os
+import re
+import csv
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier, export_text
+from pcap_features import FEATURES, flow_ends, read_snapshots
+from collision_simulator import macro_f1, tree_inputs
+
+import leo_path
+from leo_ctrlplane_generator import build_tree_from_file, build_tree_from_sklearn
+from leo_quantization import load_quantization, quantize_tree
+
+PROTOCOLS = {'icmp' : 1, 'tcp' : 6, 'udp' : 17}
+DEFAULT_FLOW_COLUMNS = 'SourceIP,DestinationIP,SourcePort,DestinationPort,Protocol'
+
+def flow_ids(columns):
+	# 64-bit id of the symmetric flow key (lower end, higher end, protocol), collisions are
+	# negligible for the millions of flows of a trace
+	low, high = flow_ends(columns)
+	low = low.astype(np.uint64)
+	high = ((high << 8) | columns['protocol']).astype(np.uint64)
+	return (low * np.uint64(0x9E3779B97F4A7C15)) ^ high
+
+def ipv4_values(addresses):
+	# Dotted IPv4 addresses as integers, -1 for anything else
+	octets = addresses.str.extract(r'^\s*(\d+)\.(\d+)\.(\d+)\.(\d+)\s*$').astype(np.float64)
+	values = ((octets[0] * 256 + octets[1]) * 256 + octets[2]) * 256 + octets[3]
+	return values.fillna(-1).astype(np.int64).to_numpy()
+
+def integer_values(values):
+	values = values.str.strip().str.lower()
+	numbers = pd.to_numeric(values, errors='coerce').fillna(values.map(PROTOCOLS))
+	return numbers.fillna(-1).astype(np.int64).to_numpy()
+
+def clean_label(label):
+	# The label cleaning of dataset-processor.py
+	label = re.sub('[^a-zA-Z ]+', '', label)
+	label = re.sub('\\s', '_', label)
+	return label.replace('__', '_')
+
+def load_flow_labels(spec, flow_columns, chunksize):
+	# Sorted flow ids and their labels, from the CSVs of the spec. A flow listed with several labels
+	# keeps its most frequent one.
+	def column_name(raw_name):
+		return raw_name.replace(' ', '') if spec['remove_spaces_from_columns'] else raw_name
+
+	wanted = flow_columns + [spec['label_column']]
+	frames = []
+	for filename in spec['files']:
+		reader = pd.read_csv(os.path.join(spec['folder'], filename), usecols=lambda c: column_name(c) in wanted,
+			dtype=str, chunksize=chunksize, encoding_errors='replace')
+		for chunk in reader:
+			chunk.columns = [column_name(c) for c in chunk.columns]
+			columns = {'src_addr' : ipv4_values(chunk[flow_columns[0]]), 'dst_addr' : ipv4_values(chunk[flow_columns[1]]),
+				'src_port' : integer_values(chunk[flow_columns[2]]), 'dst_port' : integer_values(chunk[flow_columns[3]]),
+				'protocol' : integer_values(chunk[flow_columns[4]])}
+			valid = np.all([values >= 0 for values in columns.values()], axis=0) & chunk[spec['label_column']].notna().to_numpy()
+			columns = {name : values[valid] for name, values in columns.items()}
+			frames.append(pd.DataFrame({'id' : flow_ids(columns), 'label' : chunk[spec['label_column']].to_numpy()[valid]}))
+
+	flows = pd.concat(frames, ignore_index=True)
+	if spec['clean_labels']:
+		flows['label'] = flows['label'].map({label : clean_label(label) for label in flows['label'].unique()})
+	counts = flows.groupby(['id', 'label']).size().reset_index(name='count')
+	counts = counts.sort_values('count', ascending=False, kind='stable').drop_duplicates('id').sort_values('id')
+	return counts['id'].to_numpy(dtype=np.uint64), counts['label'].to_numpy()
+
+def label_rows(ids, flow_id_index, flow_codes):
+	# Class of every row, -1 for flows without a label
+	position = np.minimum(np.searchsorted(flow_id_index, ids), max(len(flow_id_index) - 1, 0))
+	if len(flow_id_index) == 0:
+		return np.full(len(ids), -1, dtype=np.int64)
+	return np.where(flow_id_index[position] == ids, flow_codes[position], -1)
+
+def in_test_split(ids, test_fraction, seed):
+	# Whole flows go to the test split, so no flow is trained on a prefix of itself
+	mixed = (ids ^ np.uint64(seed)) * np.uint64(0xBF58476D1CE4E5B9)
+	return (mixed >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_fraction
+
+def snapshot_chunks(snapshots, names, chunk_rows):
+	# Copies of chunk_rows rows at a time, the columns themselves stay memory-mapped
+	for start in range(0, len(snapshots), chunk_rows):
+		yield {name : np.array(snapshots[name].to_numpy()[start:start + chunk_rows]) for name in names}
+
+def labelled_chunks(snapshots, features, flow_id_index, flow_codes, chunk_rows, test_fraction, seed, split):
+	# The labelled rows of the training ('train') or test ('test') flows, 'all' keeps every flow
+	names = ['src_addr', 'dst_addr', 'src_port', 'dst_port', 'protocol', 'flow_packets'] + features
+	for chunk in snapshot_chunks(snapshots, names, chunk_rows):
+		ids = flow_ids(chunk)
+		y = label_rows(ids, flow_id_index, flow_codes)
+		keep = y >= 0
+		if split != 'all':
+			keep &= in_test_split(ids, test_fraction, seed) == (split == 'test')
+		chunk = {name : values[keep] for name, values in chunk.items()}
+		yield chunk, y[keep]
+
+def sample_training_rows(snapshots, features, flow_id_index, flow_codes, chunk_rows, test_fraction, seed, train_packets, train_rows):
+	# Snapshots after packets 1..train_packets of the training flows (every packet if 0). A first pass
+	# counts them, the second keeps about train_rows of them, so memory does not grow with the trace.
+	def eligible(chunk):
+		return chunk['flow_packets'] <= train_packets if train_packets > 0 else np.ones(len(chunk['flow_packets']), dtype=bool)
+
+	total = 0
+	for chunk, y in labelled_chunks(snapshots, [], flow_id_index, flow_codes, chunk_rows, test_fraction, seed, 'train'):
+		total += int(np.count_nonzero(eligible(chunk)))
+	rate = min(1.0, train_rows / max(total, 1))
+
+	rng = np.random.RandomState(seed)
+	X = []
+	Y = []
+	for chunk, y in labelled_chunks(snapshots, features, flow_id_index, flow_codes, chunk_rows, test_fraction, seed, 'train'):
+		keep = eligible(chunk) & (rng.random_sample(len(y)) < rate)
+		X.append(np.stack([chunk[name][keep] for name in features], axis=1))
+		Y.append(y[keep])
+	return np.concatenate(X) if X else np.zeros((0, len(features))), np.concatenate(Y) if Y else np.zeros(0, dtype=np.int64), total
+
+def early_confusion(chunks, tree, quantizations, num_classes, max_packets):
+	# One confusion matrix per packet index 1..max_packets of a flow, and at index 0 the matrix over
+	# every packet, since the data plane classifies them all
+	C = num_classes
+	confusion = np.zeros((max_packets + 1, C, C), dtype=np.int64)
+	for chunk, y in chunks:
+		if len(y) == 0:
+			continue
+		predicted = tree.predict(tree_inputs(chunk, tree.feature_names, quantizations))
+		confusion[0] += np.bincount(y * C + predicted, minlength=C * C).reshape(C, C)
+		early = chunk['flow_packets'] <= max_packets
+		index = (chunk['flow_packets'][early] * C + y[early]) * C + predicted[early]
+		confusion[1:] += np.bincount(index, minlength=(max_packets + 1) * C * C).reshape(max_packets + 1, C, C)[1:]
+	return confusion
+
+def class_f1(confusion):
+	tp = np.diag(confusion).astype(np.float64)
+	total = confusion.sum(axis=0) + confusion.sum(axis=1)
+	return [2 * t / n if n > 0 else None for t, n in zip(tp, total)]
+
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program reports how the F1 score of a decision tree grows with the number of packets seen per flow, on the per-packet features of pcap_features.py.')
+
+	parser.add_argument('--snapshot_dir', type=str, required=True, help='The output directory of pcap_features.py.')
+	parser.add_argument('--spec', type=str, required=True, help='The dataset spec whose CSVs label the flows of the pcaps.')
+	parser.add_argument('--flow_columns', type=str, default=DEFAULT_FLOW_COLUMNS, help='The CSV columns of the source address, destination address, source port, destination port and protocol (Default: ' + DEFAULT_FLOW_COLUMNS + ').')
+	parser.add_argument('--binary', action='store_true', help='Merge every label but the benign one into MALICIOUS.')
+	parser.add_argument('--classes', type=str, help='Comma-separated labels in the order of the tree classes (Default: the sorted labels, as LabelEncoder numbers them).')
+	tree_source = parser.add_mutually_exclusive_group(required=True)
+	tree_source.add_argument('--input_filename', type=str, help='Evaluate this decision tree, exported by scikit-learn\'s export_text(...), on every labelled flow.')
+	tree_source.add_argument('--train', action='store_true', help='Train a tree on snapshots of the training flows and evaluate it on the test flows.')
+	parser.add_argument('--quantization', type=str, help='Feature quantization of --input_filename, applied to the features before the tree.')
+	parser.add_argument('--features', type=str, help='Comma-separated features to train on (Default: every feature of the snapshots).')
+	parser.add_argument('--train_packets', type=int, default=0, help='Train on the snapshots after packets 1..N of each flow only (Default: 0 = every packet).')
+	parser.add_argument('--train_rows', type=int, default=1000000, help='Training snapshots sampled from the trace (Default: 1000000).')
+	parser.add_argument('--max_depth', type=int, default=10, help='Depth of the trained tree (Default: 10).')
+	parser.add_argument('--max_leaf_nodes', type=int, default=1024, help='Leaves of the trained tree (Default: 1024).')
+	parser.add_argument('--test_fraction', type=float, default=0.25, help='Fraction of the flows kept for testing when training (Default: 0.25).')
+	parser.add_argument('--output_filename', type=str, help='Write the trained tree there, in the export_text(...) format of the generators.')
+	parser.add_argument('--max_packets', type=int, default=20, help='Report the F1 score after each of the first N packets of a flow (Default: 20).')
+	parser.add_argument('--target_f1', type=float, help='Report the first packet from which the macro F1 stays at or above this value.')
+	parser.add_argument('--chunk_rows', type=int, default=1 << 20, help='Snapshot rows processed at a time (Default: 1048576).')
+	parser.add_argument('--seed', type=int, default=0, help='Seed of the flow split and the training sample (Default: 0).')
+	parser.add_argument('--results_filename', type=str, help='Optional CSV of the results, with the F1 score of every class.')
+	args = parser.parse_args()
+
+	f = open(args.spec)
+	spec = json.load(f)
+	f.close()
+	flow_columns = args.flow_columns.split(',')
+	if len(flow_columns) != 5:
+		parser.error('--flow_columns takes 5 columns')
+
+	start = time.perf_counter()
+	flow_id_index, flow_labels = load_flow_labels(spec, flow_columns, args.chunk_rows)
+	if args.binary:
+		flow_labels = np.where(flow_labels == spec['benign_label'], spec['benign_label'], 'MALICIOUS').astype(object)
+	classes = args.classes.split(',') if args.classes is not None else sorted(set(flow_labels))
+	codes = {label : i for i, label in enumerate(classes)}
+	flow_codes = np.array([codes.get(label, -1) for label in flow_labels], dtype=np.int64)
+	print('Labelled flows:', len(flow_id_index), '| Classes:', ', '.join(classes))
+
+	snapshots = read_snapshots(args.snapshot_dir)
+	available = [name for name in snapshots.columns if name in FEATURES]
+	quantizations = None
+	if args.train:
+		features = args.features.split(',') if args.features is not None else available
+		if len(features) == 0 or any(name not in available for name in features):
+			parser.error('the snapshots only have the features ' + ', '.join(available))
+		X, y, eligible = sample_training_rows(snapshots, features, flow_id_index, flow_codes, args.chunk_rows,
+			args.test_fraction, args.seed, args.train_packets, args.train_rows)
+		if len(y) == 0:
+			parser.error('no labelled training snapshots')
+		model = DecisionTreeClassifier(max_depth=args.max_depth, max_leaf_nodes=args.max_leaf_nodes, criterion='entropy', class_weight='balanced', random_state=args.seed)
+		model.fit(X, y)
+		print('Trained on', len(y), 'of', eligible, 'snapshots |', model.get_n_leaves(), 'leaves')
+		tree = build_tree_from_sklearn(model, features)
+		if args.output_filename is not None:
+			f = open(args.output_filename, 'w')
+			f.write(export_text(model, feature_names=features, max_depth=args.max_depth))
+			f.close()
+		split = 'test'
+	else:
+		tree = build_tree_from_file(args.input_filename)
+		missing = [name for name in tree.feature_names if name not in available]
+		if len(missing) > 0:
+			parser.error('the snapshots do not have the features ' + ', '.join(missing))
+		if args.quantization is not None:
+			quantizations = load_quantization(args.quantization)['features']
+			quantize_tree(tree, quantizations)
+		split = 'all'
+
+	leaf_labels = tree.label[tree.left == -1]
+	if leaf_labels.min() < 0 or leaf_labels.max() >= len(classes):
+		parser.error('the tree predicts classes 0..' + str(leaf_labels.max()) + ', but there are ' + str(len(classes)) + ' labels')
+
+	chunks = labelled_chunks(snapshots, list(tree.feature_names), flow_id_index, flow_codes, args.chunk_rows, args.test_fraction, args.seed, split)
+	confusion = early_confusion(chunks, tree, quantizations, len(classes), args.max_packets)
+	elapsed = time.perf_counter() - start
+
+	print('{:>8}  {:>12}  {:>10}  {:>10}'.format('Packets', 'Snapshots', 'Accuracy', 'Macro F1'))
+	rows = []
+	for n in list(range(1, args.max_packets + 1)) + [0]:
+		c = confusion[n]
+		total = int(c.sum())
+		accuracy = np.trace(c) / total if total > 0 else 0
+		f1 = macro_f1(c) if total > 0 else 0
+		print('{:>8}  {:>12}  {:>10.4f}  {:>10.4f}'.format(n if n > 0 else 'All', total, accuracy, f1))
+		rows.append([n if n > 0 else 'All', total, accuracy, f1] + ['' if v is None else v for v in class_f1(c)])
+
+	if args.target_f1 is not None:
+		reached = [row[0] for i, row in enumerate(rows[:-1]) if all(r[1] == 0 or r[3] >= args.target_f1 for r in rows[i:-1])]
+		if len(reached) == 0:
+			print('Error: The macro F1 does not stay above', args.target_f1, 'within', args.max_packets, 'packets')
+		else:
+			print('The macro F1 stays above', args.target_f1, 'from packet', reached[0])
+	print('Time (s): {:.1f}'.format(elapsed))
+
+	if args.results_filename is not None:
+		f = open(args.results_filename, 'w', newline='')
+		writer = csv.writer(f)
+		writer.writerow(['Packets', 'Snapshots', 'Accuracy', 'Macro F1'] + ['F1 ' + label for label in classes])
+		writer.writerows(rows)
+		f.close()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+class SharedDataset:
+	# Copies every column of a dataframe into shared memory once, workers attach to it
+	# from the spec instead of receiving a pickled copy of the dataset
+	def __init__(self, dataset):
+		self.blocks = []
+		self.spec = []
+		for name in dataset.columns:
+			values = dataset[name]
+			column = {'name' : name}
+			if values.dtype.kind in 'biuf':
+				values = values.to_numpy()
+			else:
+				# Strings are shared as integer codes, their few distinct values are pickled
+				codes, uniques = pd.factorize(values)
+				values = codes.astype(np.int32)
+				column['categories'] = uniques.tolist()
+
+			block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+			np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+			column['block'] = block.name
+			column['dtype'] = values.dtype.str
+			column['rows'] = len(values)
+			self.blocks.append(block)
+			self.spec.append(column)
+
+	def close(self):
+		for block in self.blocks:
+			block.close()
+			block.unlink()
+		self.blocks = []
+
+def attach_dataset(spec):
+	blocks = []
+	columns = {}
+	for column in spec:
+		block = shared_memory.SharedMemory(name=column['block'])
+		values = np.ndarray((column['rows'],), dtype=np.dtype(column['dtype']), buffer=block.buf)
+		if 'categories' in column:
+			values = np.array(column['categories'], dtype=object)[values]
+		columns[column['name']] = values
+		blocks.append(block)
+	return pd.DataFrame(columns, copy=False), blocks
+
+worker_dataset = None
+worker_blocks = None
+
+def init_worker(spec):
+	global worker_dataset, worker_blocks
+	worker_dataset, worker_blocks = attach_dataset(spec)
+
+def run_in_worker(run_experiment, exp):
+	return run_experiment(worker_dataset, exp)
+
+def run_experiments(dataset, experiments, run_experiment, workers=None):
+	# Runs run_experiment(dataset, exp) for every experiment and returns the results in experiment order.
+	# run_experiment must not modify the dataset it is given.
+	if workers is None:
+		workers = os.cpu_count()
+	workers = min(workers, len(experiments))
+
+	if workers <= 1:
+		return [run_experiment(dataset, exp) for exp in experiments]
+
+	shared = SharedDataset(dataset)
+	try:
+		with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(shared.spec,)) as pool:
+			return list(pool.map(run_in_worker, [run_experiment] * len(experiments), experiments))
+	finally:
+		shared.close()
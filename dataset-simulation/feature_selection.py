@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import numpy as np
+from sklearn.base import clone
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.feature_selection import RFE, mutual_info_classif
+
+STRATEGIES = ['rfe', 'importance', 'mutual_info']
+
+DEFAULT_CONFIG = {
+	'strategy' : 'rfe',
+	# Features removed per RFE iteration (an int, or a fraction of the remaining features)
+	'step' : 1,
+	# Fraction of the training rows the selection runs on
+	'sample' : 1,
+	# Keep only the best features by mutual information before the strategy runs (0 = off)
+	'mi_prefilter' : 0,
+	# Rank the features with one tree shared by all experiments instead of each experiment's depth/leaf-limited
+	# tree, so that experiments with the same feature count reuse a selection
+	'shared_ranking' : False,
+	# Depth of the shared ranking tree
+	'max_depth' : None,
+	'seed' : 0,
+}
+
+def selection_config(config=None):
+	selection = dict(DEFAULT_CONFIG)
+	if config is not None:
+		selection.update(config)
+	if selection['strategy'] not in STRATEGIES:
+		raise ValueError('Unknown feature selection strategy ' + str(selection['strategy']) + ', expected one of ' + ', '.join(STRATEGIES))
+	return selection
+
+def subsample(x, y, fraction, seed):
+	if fraction >= 1:
+		return x, y
+	rng = np.random.RandomState(seed)
+	rows = rng.choice(len(y), max(int(len(y) * fraction), 1), replace=False)
+	rows.sort()
+	return x[rows], y[rows]
+
+def mutual_info_ranking(x, y, seed):
+	# Column indices, best first
+	scores = mutual_info_classif(x, y, random_state=seed)
+	return np.argsort(-scores, kind='stable')
+
+def rfe_selection(model, x, y, num_features, step):
+	rfe = RFE(model, n_features_to_select=num_features, step=step)
+	rfe.fit(x, y)
+	return np.flatnonzero(rfe.get_support())
+
+def importance_selection(model, x, y, num_features):
+	# Fits once per round and keeps the more important half, instead of one fit per removed feature
+	columns = np.arange(x.shape[1])
+	while len(columns) > num_features:
+		model.fit(x[:, columns], y)
+		order = np.argsort(-model.feature_importances_, kind='stable')
+		columns = np.sort(columns[order[:max(num_features, len(columns) // 2)]])
+	return columns
+
+def ranking_model(config, model):
+	if config['shared_ranking']:
+		return DecisionTreeClassifier(max_depth=config['max_depth'], criterion='entropy', class_weight='balanced', random_state=config['seed'])
+	if model is None:
+		raise ValueError('Feature selection needs the experiment model unless shared_ranking is set')
+	return clone(model)
+
+def select_columns(num_features, x, y, config, model=None):
+	x, y = subsample(x, y, config['sample'], config['seed'])
+	columns = np.arange(x.shape[1])
+	if num_features >= len(columns):
+		return columns
+
+	if config['strategy'] == 'mutual_info':
+		return np.sort(mutual_info_ranking(x, y, config['seed'])[:num_features])
+
+	if 0 < config['mi_prefilter'] < len(columns):
+		columns = np.sort(mutual_info_ranking(x, y, config['seed'])[:max(config['mi_prefilter'], num_features)])
+
+	model = ranking_model(config, model)
+	if config['strategy'] == 'rfe':
+		return columns[rfe_selection(model, x[:, columns], y, num_features, config['step'])]
+	return columns[importance_selection(model, x[:, columns], y, num_features)]
+
+class SelectionCache:
+	# Selected features per (dataset, preprocessing, train/test split, selection config, feature count), one
+	# JSON file each. Experiments with the same feature count and split reuse the selection instead of running
+	# it again; a selection is never reused on another split, whose test rows it may have been fitted on.
+	def __init__(self, cache_dir, dataset_key):
+		self.cache_dir = cache_dir
+		self.dataset_key = dataset_key
+		os.makedirs(cache_dir, exist_ok=True)
+
+	def path(self, num_features, features, config, preprocessing, split_seed=None):
+		digest = hashlib.sha256()
+		digest.update(json.dumps([self.dataset_key, preprocessing, split_seed, config, num_features, features], sort_keys=True).encode())
+		return os.path.join(self.cache_dir, digest.hexdigest() + '.json')
+
+	def get(self, path):
+		if not os.path.exists(path):
+			return None
+		f = open(path)
+		selected = json.load(f)
+		f.close()
+		return selected
+
+	def put(self, path, selected):
+		# Workers may select the same features concurrently, the last complete write wins
+		tmp = path + '.' + str(os.getpid()) + '.tmp'
+		f = open(tmp, 'w')
+		json.dump(selected, f)
+		f.close()
+		os.replace(tmp, path)
+
+def select_features(num_features, x, y, features, config=None, cache=None, preprocessing=None, split_seed=None, model=None):
+	# Returns a support mask over the columns of x and the names of the selected features.
+	# Unless shared_ranking is set, the features are ranked with a clone of the experiment's model.
+	config = selection_config(config)
+	path = None
+	selected = None
+	if cache is not None:
+		key = dict(config)
+		if not config['shared_ranking'] and model is not None:
+			key['model'] = model.get_params()
+		path = cache.path(num_features, features, key, preprocessing, split_seed)
+		selected = cache.get(path)
+
+	if selected is None:
+		columns = select_columns(num_features, np.asarray(x), np.asarray(y), config, model)
+		selected = [features[i] for i in columns]
+		if cache is not None:
+			cache.put(path, selected)
+
+	map = [feature in selected for feature in features]
+	return map, [feature for feature in features if feature in selected]
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts of this directory import the modules of leo-generator through this module
+LEO_GENERATOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'leo-generator')
+if LEO_GENERATOR_DIR not in sys.path:
+	sys.path.append(LEO_GENERATOR_DIR)
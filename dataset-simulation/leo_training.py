@@ -0,0 +1,58 @@
+from sklearn.base import clone
+
+import leo_path
+from leo_cache import load_manifest
+from leo_ctrlplane_generator import build_tree_from_sklearn, tree_fits
+from leo_quantization import fit_quantization, quantize_tree, quantize_columns, write_quantization
+
+def load_leo_target(filename):
+	# The manifest written by leo_dataplane_generator.py next to the P4 program
+	manifest = load_manifest(filename)
+	for key in ['mem_type', 'muxed_alu_config', 'features', 'leaf_limit', 'transient', 'tables']:
+		if key not in manifest:
+			raise ValueError(filename + ' is not a Leo manifest, it has no ' + key)
+	return manifest
+
+def fit_leaves(model, x, y, features, manifest, max_leaf_nodes):
+	candidate = clone(model).set_params(max_leaf_nodes=max_leaf_nodes)
+	candidate.fit(x, y)
+	return candidate, tree_fits(build_tree_from_sklearn(candidate, features), manifest)
+
+def fit_for_leo(model, x, y, features, manifest):
+	# Trains the tree with the largest leaf budget (up to the model's own max_leaf_nodes) whose
+	# rules fit every layer of the data plane. Best-first growth makes a smaller budget a prefix of
+	# the larger tree, so the budget is binary searched; every returned model has been checked.
+	if model.random_state is None:
+		model = clone(model).set_params(random_state=0)
+
+	high = model.max_leaf_nodes
+	if high is None:
+		high = 2 ** model.max_depth if model.max_depth is not None else len(y)
+
+	best, fits = fit_leaves(model, x, y, features, manifest, high)
+	if fits:
+		return best, high
+
+	low = 2
+	best, fits = fit_leaves(model, x, y, features, manifest, low)
+	if not fits:
+		raise ValueError('Not even a ' + str(low) + '-leaf tree fits the Leo data plane of ' + str(manifest['features']) + ' features')
+
+	while high - low > 1:
+		mid = (low + high) // 2
+		candidate, fits = fit_leaves(model, x, y, features, manifest, mid)
+		if fits:
+			best, low = candidate, mid
+		else:
+			high = mid
+
+	return best, low
+
+def quantize_for_leo(model, x_train, x_test, features, width, filename):
+	# Learns the feature quantization on the training rows, writes it for leo_ctrlplane_generator.py
+	# and returns the predictions of the quantized tree, as the data plane will compute them
+	tree = build_tree_from_sklearn(model, features)
+	quantizations = fit_quantization(tree, x_train, width)
+	write_quantization(quantizations, width, filename)
+	quantize_tree(tree, quantizations)
+	return tree.predict(quantize_columns(x_test, features, quantizations))
@@ -0,0 +1,513 @@
+import os
+import json
+import mmap
+import time
+import struct
+import argparse
+import functools
+import numpy as np
+import pandas as pd
+
+PCAP_MAGIC = 0xa1b2c3d4
+PCAP_MAGIC_NS = 0xa1b23c4d
+
+# Bytes before the IPv4 header per link type: null/loopback, Ethernet, raw IP, Linux cooked capture
+LINK_TYPES = {0 : 4, 1 : 14, 101 : 0, 113 : 16, 228 : 0}
+
+TCP_FLAGS = {'fin' : 0x01, 'syn' : 0x02, 'rst' : 0x04, 'psh' : 0x08, 'ack' : 0x10, 'urg' : 0x20, 'ece' : 0x40, 'cwr' : 0x80}
+
+# Reflected CRCs: polynomial, width, initial value, final XOR
+HASHES = {
+	'crc32' : (0xEDB88320, 32, 0xFFFFFFFF, 0xFFFFFFFF),
+	'crc32c' : (0x82F63B78, 32, 0xFFFFFFFF, 0xFFFFFFFF),
+	'crc16' : (0xA001, 16, 0, 0),
+}
+
+# The CICFlowMeter features a switch can keep in registers, as the register update, the per-packet
+# value and the packets that update it. Lengths are payload bytes and times microseconds, as in the CSVs.
+FEATURES = {
+	'DestinationPort' : ('first', 'dst_port', 'all'),
+	'FlowDuration' : ('duration', 'ts', 'all'),
+	'TotalFwdPackets' : ('sum', 'one', 'fwd'),
+	'TotalBackwardPackets' : ('sum', 'one', 'bwd'),
+	'TotalLengthofFwdPackets' : ('sum', 'payload', 'fwd'),
+	'TotalLengthofBwdPackets' : ('sum', 'payload', 'bwd'),
+	'FwdPacketLengthMax' : ('max', 'payload', 'fwd'),
+	'FwdPacketLengthMin' : ('min', 'payload', 'fwd'),
+	'BwdPacketLengthMax' : ('max', 'payload', 'bwd'),
+	'BwdPacketLengthMin' : ('min', 'payload', 'bwd'),
+	'FlowIATMax' : ('max', 'flow_iat', 'flow_iat_valid'),
+	'FlowIATMin' : ('min', 'flow_iat', 'flow_iat_valid'),
+	'FwdIATTotal' : ('sum', 'fwd_iat', 'fwd_iat_valid'),
+	'FwdIATMax' : ('max', 'fwd_iat', 'fwd_iat_valid'),
+	'FwdIATMin' : ('min', 'fwd_iat', 'fwd_iat_valid'),
+	'BwdIATTotal' : ('sum', 'bwd_iat', 'bwd_iat_valid'),
+	'BwdIATMax' : ('max', 'bwd_iat', 'bwd_iat_valid'),
+	'BwdIATMin' : ('min', 'bwd_iat', 'bwd_iat_valid'),
+	'FwdPSHFlags' : ('sum', 'psh', 'fwd'),
+	'BwdPSHFlags' : ('sum', 'psh', 'bwd'),
+	'FwdURGFlags' : ('sum', 'urg', 'fwd'),
+	'BwdURGFlags' : ('sum', 'urg', 'bwd'),
+	'FwdHeaderLength' : ('sum', 'header_len', 'fwd'),
+	'BwdHeaderLength' : ('sum', 'header_len', 'bwd'),
+	'MinPacketLength' : ('min', 'payload', 'all'),
+	'MaxPacketLength' : ('max', 'payload', 'all'),
+	'FINFlagCount' : ('sum', 'fin', 'all'),
+	'SYNFlagCount' : ('sum', 'syn', 'all'),
+	'RSTFlagCount' : ('sum', 'rst', 'all'),
+	'PSHFlagCount' : ('sum', 'psh', 'all'),
+	'ACKFlagCount' : ('sum', 'ack', 'all'),
+	'URGFlagCount' : ('sum', 'urg', 'all'),
+	'CWEFlagCount' : ('sum', 'cwr', 'all'),
+	'ECEFlagCount' : ('sum', 'ece', 'all'),
+	'Init_Win_bytes_forward' : ('first', 'window', 'fwd_tcp'),
+	'Init_Win_bytes_backward' : ('first', 'window', 'bwd_tcp'),
+	'act_data_pkt_fwd' : ('sum', 'one', 'fwd_data'),
+	'min_seg_size_forward' : ('min', 'header_len', 'fwd'),
+	'ActiveMax' : ('max', 'active', 'idle'),
+	'ActiveMin' : ('min', 'active', 'idle'),
+	'IdleMax' : ('max', 'flow_iat', 'idle'),
+	'IdleMin' : ('min', 'flow_iat', 'idle'),
+}
+
+# Written next to the features for every packet, to join labels and follow flows
+PACKET_COLUMNS = ['timestamp', 'src_addr', 'dst_addr', 'src_port', 'dst_port', 'protocol', 'slot', 'flow_packets']
+
+@functools.lru_cache(maxsize=None)
+def crc_table(poly):
+	table = np.arange(256, dtype=np.uint32)
+	for i in range(8):
+		table = np.where(table & 1, (table >> np.uint32(1)) ^ np.uint32(poly), table >> np.uint32(1)).astype(np.uint32)
+	return table
+
+def crc(key, name):
+	# key holds one row of bytes per packet
+	poly, width, init, xorout = HASHES[name]
+	table = crc_table(poly)
+	value = np.full(len(key), init, dtype=np.uint32)
+	for i in range(key.shape[1]):
+		value = table[(value ^ key[:, i]) & 0xFF] ^ (value >> np.uint32(8))
+	return ((value ^ np.uint32(xorout)) & np.uint32((1 << width) - 1)).astype(np.int64)
+
+def flow_ends(packets):
+	# Both directions of a flow give the same ends: the lower (address, port) end comes first
+	src = (packets['src_addr'] << 16) | packets['src_port']
+	dst = (packets['dst_addr'] << 16) | packets['dst_port']
+	return np.minimum(src, dst), np.maximum(src, dst)
+
+def flow_keys(packets):
+	# Both directions of a flow hash the same
+	low, high = flow_ends(packets)
+	fields = [(low >> 16, 4), (high >> 16, 4), (low & 0xFFFF, 2), (high & 0xFFFF, 2), (packets['protocol'], 1)]
+	key = np.empty((len(low), 13), dtype=np.uint32)
+	column = 0
+	for values, size in fields:
+		for b in range(size - 1, -1, -1):
+			key[:, column] = (values >> (8 * b)) & 0xFF
+			column += 1
+	return key
+
+def read_pcap(filename, batch_size):
+	# Yields the IPv4 packets of a pcap as columns, batch_size records at a time. The file is memory-mapped:
+	# only the walk over the record lengths is sequential, the headers are gathered with numpy.
+	f = open(filename, 'rb')
+	if os.fstat(f.fileno()).st_size < 24:
+		f.close()
+		return
+	buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+	data = np.frombuffer(buf, dtype=np.uint8)
+
+	magic = struct.unpack_from('<I', buf, 0)[0]
+	if magic in (PCAP_MAGIC, PCAP_MAGIC_NS):
+		endian = '<'
+	elif struct.unpack_from('>I', buf, 0)[0] in (PCAP_MAGIC, PCAP_MAGIC_NS):
+		endian = '>'
+	else:
+		raise ValueError(filename + ' is not a pcap file (pcapng is not supported, convert it with editcap -F pcap)')
+	ns = struct.unpack_from(endian + 'I', buf, 0)[0] == PCAP_MAGIC_NS
+	link_type = struct.unpack_from(endian + 'I', buf, 20)[0] & 0xFFFF
+	if link_type not in LINK_TYPES:
+		raise ValueError(filename + ' has unsupported link type ' + str(link_type))
+
+	def gather(pos, size, limit, big=True):
+		valid = pos + size <= limit
+		pos = np.where(valid, pos, 0)
+		value = np.zeros(len(pos), dtype=np.int64)
+		for b in range(size):
+			shift = 8 * (size - 1 - b) if big else 8 * b
+			value |= data[pos + b].astype(np.int64) << shift
+		return np.where(valid, value, 0)
+
+	caplen_at = struct.Struct(endian + 'I').unpack_from
+	pos = 24
+	end = len(buf)
+	while pos + 16 <= end:
+		offsets = []
+		append = offsets.append
+		for i in range(batch_size):
+			if pos + 16 > end:
+				break
+			next_pos = pos + 16 + caplen_at(buf, pos + 8)[0]
+			if next_pos > end:
+				# A truncated last record
+				pos = end
+				break
+			append(pos)
+			pos = next_pos
+		if len(offsets) == 0:
+			break
+
+		record = np.array(offsets, dtype=np.int64)
+		little = endian == '<'
+		ts_sec = gather(record, 4, end, not little)
+		ts_frac = gather(record + 4, 4, end, not little)
+		start = record + 16
+		limit = start + gather(record + 8, 4, end, not little)
+
+		l3 = start + LINK_TYPES[link_type]
+		if link_type == 1:
+			ether_type = gather(start + 12, 2, limit)
+			vlan = ether_type == 0x8100
+			l3 = np.where(vlan, l3 + 4, l3)
+			ipv4 = np.where(vlan, gather(start + 16, 2, limit), ether_type) == 0x0800
+		elif link_type == 113:
+			ipv4 = gather(start + 14, 2, limit) == 0x0800
+		else:
+			ipv4 = np.ones(len(record), dtype=bool)
+		version_ihl = gather(l3, 1, limit)
+		ipv4 &= ((version_ihl >> 4) == 4) & (l3 + 20 <= limit)
+
+		keep = np.flatnonzero(ipv4)
+		l3 = l3[keep]
+		limit = limit[keep]
+		ihl = (version_ihl[keep] & 0xF) * 4
+		protocol = gather(l3 + 9, 1, limit)
+		ip_len = gather(l3 + 2, 2, limit)
+		unfragmented = (gather(l3 + 6, 2, limit) & 0x1FFF) == 0
+		l4 = l3 + ihl
+		has_ports = unfragmented & ((protocol == 6) | (protocol == 17))
+		tcp = unfragmented & (protocol == 6)
+
+		header_len = np.where(tcp, (gather(l4 + 12, 1, limit) >> 4) * 4, np.where(has_ports, 8, 0))
+		packets = {
+			'ts' : ts_sec[keep] * 1000000 + (ts_frac[keep] // 1000 if ns else ts_frac[keep]),
+			'src_addr' : gather(l3 + 12, 4, limit),
+			'dst_addr' : gather(l3 + 16, 4, limit),
+			'src_port' : np.where(has_ports, gather(l4, 2, limit), 0),
+			'dst_port' : np.where(has_ports, gather(l4 + 2, 2, limit), 0),
+			'protocol' : protocol,
+			'ip_len' : ip_len,
+			'header_len' : header_len,
+			'payload' : np.maximum(ip_len - ihl - header_len, 0),
+			'tcp' : tcp,
+			'flags' : np.where(tcp, gather(l4 + 13, 1, limit), 0),
+			'window' : np.where(tcp, gather(l4 + 14, 2, limit), 0),
+		}
+		yield packets
+
+	del data
+	buf.close()
+	f.close()
+
+def segmented_max(values, seg):
+	# Running maximum of values >= 0 that restarts at every segment: segments are offset past each
+	# other so that a single cumulative maximum never crosses a boundary
+	if len(values) == 0:
+		return values
+	span = int(values.max()) + 1
+	if span * (int(seg[-1]) + 1) >= 1 << 62:
+		raise ValueError('The values of a batch are too large to scan, use a smaller batch size')
+	offset = seg.astype(np.int64) * span
+	return np.maximum.accumulate(values + offset) - offset
+
+class FlowTable:
+	# A fixed number of slots indexed by a hash of the flow, one register array per feature, as in
+	# a switch. Flows that hash to the same slot share its registers unless evict is set: then the
+	# slot keeps a tag of its flow and a packet of another flow starts over. A flow also starts over
+	# after timeout microseconds without packets (0 = never). The 'exact' hash gives every flow a
+	# slot of its own, as a table without collisions.
+	def __init__(self, num_slots, features, hash_name='crc32', evict=False, timeout=0, activity_timeout=5000000):
+		for name in features:
+			if name not in FEATURES:
+				raise ValueError('Feature ' + name + ' cannot be computed from packets')
+		if hash_name not in HASHES and hash_name != 'exact':
+			raise ValueError('Unknown hash ' + hash_name + ', expected exact or one of ' + ', '.join(HASHES))
+		self.num_slots = num_slots
+		self.features = list(features)
+		self.hash_name = hash_name
+		self.tag_hash = 'crc32c' if hash_name != 'crc32c' else 'crc32'
+		self.evict = evict
+		self.timeout = timeout
+		self.activity_timeout = activity_timeout
+		self.registers = {}
+		self.empty = {}
+		self.flow_ids = {}
+		self.origin = None
+
+	def register(self, name, empty):
+		if name not in self.registers:
+			self.registers[name] = np.full(self.num_slots, empty, dtype=np.int64)
+			self.empty[name] = empty
+		return self.registers[name]
+
+	def index(self, packets):
+		key = flow_keys(packets)
+		tag = crc(key, self.tag_hash)
+		if self.hash_name != 'exact':
+			return crc(key, self.hash_name) % self.num_slots, tag
+
+		flows = np.ascontiguousarray(key.astype(np.uint8)).view('V13').ravel()
+		unique, inverse = np.unique(flows, return_inverse=True)
+		ids = np.array([self.flow_ids.setdefault(k, len(self.flow_ids)) for k in unique.tolist()], dtype=np.int64)
+		if len(self.flow_ids) > self.num_slots:
+			# The registers grow with the number of flows
+			grown = max(len(self.flow_ids), 2 * self.num_slots)
+			for name, values in self.registers.items():
+				self.registers[name] = np.concatenate([values, np.full(grown - self.num_slots, self.empty[name], dtype=np.int64)])
+			self.num_slots = grown
+		return ids[inverse.ravel()], tag
+
+	def running(self, update, name, values, mask):
+		# The register after every packet of the batch. Registers that may hold nothing use -1:
+		# 'first' and 'last' keep the value of the first or last matching packet, 'min' the smallest.
+		if name in self.results:
+			return self.results[name]
+		empty = 0 if update in ('sum', 'max') else -1
+		state = np.where(self.carry, self.register(name, empty)[self.slot], empty)
+		seg = self.seg
+		if update == 'sum':
+			values = np.cumsum(np.where(mask, values, 0))
+			result = values - np.r_[0, values][self.starts][seg] + state
+		elif update == 'max':
+			result = np.maximum(segmented_max(np.where(mask, values, 0), seg), state)
+		elif update == 'min':
+			span = int(values.max()) + 1 if len(values) > 0 else 1
+			acc = segmented_max(np.where(mask, span - values, 0), seg)
+			result = np.where(acc > 0, span - acc, -1)
+			result = np.where(state >= 0, np.where(result >= 0, np.minimum(result, state), state), result)
+		else:
+			n = len(values)
+			if update == 'first':
+				acc = segmented_max(np.where(mask, n - np.arange(n), 0), seg)
+				result = np.where(acc > 0, values[np.minimum(n - acc, n - 1)], -1)
+				result = np.where(state >= 0, state, result)
+			else:
+				acc = segmented_max(np.where(mask, np.arange(1, n + 1), 0), seg)
+				result = np.where(acc > 0, values[np.maximum(acc - 1, 0)], state)
+
+		self.results[name] = result
+		self.states[name] = state
+		return result
+
+	def previous(self, name):
+		# The register before every packet: the previous packet of the flow, or the carried register
+		result = self.results[name]
+		previous = self.states[name].copy()
+		same = self.seg[1:] == self.seg[:-1]
+		previous[1:][same] = result[:-1][same]
+		return previous
+
+	def column(self, name):
+		# Per-packet values and masks, computed once per batch and only when a feature needs them
+		if name in self.columns:
+			return self.columns[name]
+		p = self.packets
+		if name == 'all':
+			value = np.ones(len(self.ts), dtype=bool)
+		elif name == 'one':
+			value = np.ones(len(self.ts), dtype=np.int64)
+		elif name == 'ts':
+			value = self.ts
+		elif name in TCP_FLAGS:
+			value = (p['flags'] & TCP_FLAGS[name]) > 0
+			value = value.astype(np.int64)
+		elif name == 'fwd':
+			src = (p['src_addr'] << 16) | p['src_port']
+			value = src == self.running('first', '_initiator', src, self.column('all'))
+		elif name == 'bwd':
+			value = ~self.column('fwd')
+		elif name == 'fwd_tcp':
+			value = self.column('fwd') & p['tcp']
+		elif name == 'bwd_tcp':
+			value = self.column('bwd') & p['tcp']
+		elif name == 'fwd_data':
+			value = self.column('fwd') & (p['payload'] > 0)
+		elif name in ('flow_iat', 'flow_iat_valid'):
+			previous = self.previous('_last_ts')
+			self.columns['flow_iat_valid'] = previous >= 0
+			self.columns['flow_iat'] = np.where(previous >= 0, self.ts - previous, 0)
+			return self.columns[name]
+		elif name in ('fwd_iat', 'fwd_iat_valid', 'bwd_iat', 'bwd_iat_valid'):
+			direction = name[:3]
+			self.running('last', '_last_' + direction + '_ts', self.ts, self.column(direction))
+			previous = self.previous('_last_' + direction + '_ts')
+			valid = self.column(direction) & (previous >= 0)
+			self.columns[direction + '_iat_valid'] = valid
+			self.columns[direction + '_iat'] = np.where(valid, self.ts - previous, 0)
+			return self.columns[name]
+		elif name == 'idle':
+			value = self.column('flow_iat_valid') & (self.column('flow_iat') > self.activity_timeout)
+		elif name == 'active':
+			# An idle gap closes the active period that started with the flow or after the previous gap
+			opens = self.column('idle') | ~self.column('flow_iat_valid')
+			self.running('last', '_active_start', self.ts, opens)
+			value = np.where(self.column('idle'), self.previous('_last_ts') - self.previous('_active_start'), 0)
+		else:
+			value = p[name]
+		self.columns[name] = value
+		return value
+
+	def update(self, packets):
+		# Runs one batch of packets through the registers, in arrival order. Returns the value of
+		# every feature right after each packet updated its slot, as the data plane reads it.
+		n = len(packets['ts'])
+		if n == 0:
+			return {name : np.zeros(0, dtype=np.int64) for name in ['slot', 'flow_packets'] + self.features}
+		if self.origin is None:
+			self.origin = int(packets['ts'][0])
+		slot, tag = self.index(packets)
+		order = np.argsort(slot, kind='stable')
+		self.packets = {name : values[order] for name, values in packets.items()}
+		self.slot = slot[order]
+		self.ts = np.maximum(self.packets['ts'] - self.origin, 0)
+		tag = tag[order]
+
+		# A packet starts a new flow in an empty slot, or after the slot changed hands or timed out
+		first_in_slot = np.ones(n, dtype=bool)
+		first_in_slot[1:] = self.slot[1:] != self.slot[:-1]
+		prev_ts = np.where(first_in_slot, self.register('_last_ts', -1)[self.slot], np.r_[-1, self.ts[:-1]])
+		prev_tag = np.where(first_in_slot, self.register('_tag', -1)[self.slot], np.r_[-1, tag[:-1]])
+		new_flow = prev_ts < 0
+		if self.evict:
+			new_flow |= tag != prev_tag
+		if self.timeout > 0:
+			new_flow |= (prev_ts >= 0) & (self.ts - prev_ts > self.timeout)
+
+		self.starts = np.flatnonzero(new_flow | first_in_slot)
+		self.seg = np.cumsum(new_flow | first_in_slot) - 1
+		self.carry = (~new_flow & first_in_slot)[self.starts][self.seg]
+		self.results = {}
+		self.states = {}
+		self.columns = {}
+
+		self.running('last', '_last_ts', self.ts, self.column('all'))
+		self.running('last', '_tag', tag, self.column('all'))
+		snapshots = {'flow_packets' : self.running('sum', '_packets', self.column('one'), self.column('all'))}
+		for name in self.features:
+			update, value, mask = FEATURES[name]
+			if update == 'duration':
+				snapshots[name] = self.ts - self.running('first', '_first_ts', self.ts, self.column('all'))
+			else:
+				snapshots[name] = np.maximum(self.running(update, name, self.column(value), self.column(mask)), 0)
+
+		# The registers keep the values after the last packet of every slot
+		last = np.flatnonzero(np.r_[first_in_slot[1:], True])
+		for name, result in self.results.items():
+			self.registers[name][self.slot[last]] = result[last]
+
+		out = {'slot' : np.empty(n, dtype=np.int64)}
+		out['slot'][order] = self.slot
+		for name, values in snapshots.items():
+			out[name] = np.empty(n, dtype=np.int64)
+			out[name][order] = values
+		return out
+
+	def occupied(self):
+		return int(np.count_nonzero(self.register('_last_ts', -1) >= 0))
+
+class SnapshotWriter:
+	# One raw int64 file per column, appended batch by batch; the manifest is written last
+	def __init__(self, output_dir, names):
+		os.makedirs(output_dir, exist_ok=True)
+		self.output_dir = output_dir
+		self.names = list(names)
+		self.files = [open(os.path.join(output_dir, str(i) + '.bin'), 'wb') for i in range(len(self.names))]
+		self.rows = 0
+		manifest_path = os.path.join(output_dir, 'manifest.json')
+		if os.path.exists(manifest_path):
+			os.remove(manifest_path)
+
+	def write(self, columns):
+		for f, name in zip(self.files, self.names):
+			np.ascontiguousarray(columns[name], dtype=np.int64).tofile(f)
+		self.rows += len(columns[self.names[0]])
+
+	def close(self):
+		for f in self.files:
+			f.close()
+		columns = [{'name' : name, 'file' : str(i) + '.bin', 'dtype' : '<i8'} for i, name in enumerate(self.names)]
+		f = open(os.path.join(self.output_dir, 'manifest.json'), 'w')
+		json.dump({'rows' : self.rows, 'columns' : columns}, f)
+		f.close()
+
+def read_snapshots(output_dir):
+	# Memory-maps the columns written by SnapshotWriter
+	f = open(os.path.join(output_dir, 'manifest.json'))
+	manifest = json.load(f)
+	f.close()
+	columns = {}
+	for column in manifest['columns']:
+		path = os.path.join(output_dir, column['file'])
+		if manifest['rows'] == 0:
+			columns[column['name']] = np.zeros(0, dtype=np.dtype(column['dtype']))
+		else:
+			columns[column['name']] = np.memmap(path, dtype=np.dtype(column['dtype']), mode='r', shape=(manifest['rows'],))
+	return pd.DataFrame(columns, copy=False)
+
+def extract_features(filenames, table, batch_size, writer=None):
+	# Streams the pcaps through the flow table, in order, and returns the number of packets
+	packets_seen = 0
+	for filename in filenames:
+		for packets in read_pcap(filename, batch_size):
+			snapshots = table.update(packets)
+			packets_seen += len(packets['ts'])
+			if writer is not None:
+				snapshots['timestamp'] = packets['ts']
+				for name in ['src_addr', 'dst_addr', 'src_port', 'dst_port', 'protocol']:
+					snapshots[name] = packets[name]
+				writer.write(snapshots)
+	return packets_seen
+
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program computes per-packet flow features from pcaps with a fixed-size, hash-indexed flow table, as the switch registers would.')
+
+	parser.add_argument('--pcap_filenames', type=str, required=True, help='Comma-separated pcap files, read in order as one trace.')
+	parser.add_argument('--output_dir', type=str, required=True, help='Directory of the output columns (one raw int64 file per column and manifest.json, see read_snapshots).')
+	parser.add_argument('--spec', type=str, help='A dataset spec, its switch_features are computed.')
+	parser.add_argument('--features', type=str, help='Comma-separated features to compute (Default: the switch_features of --spec, otherwise all supported features).')
+	parser.add_argument('--slots', type=int, default=1 << 20, help='Number of flow table slots, as the size of the register arrays (Default: 1048576).')
+	parser.add_argument('--hash', type=str, default='crc32', choices=sorted(HASHES) + ['exact'], help='Hash that indexes the flow table, exact gives every flow its own slot (Default: crc32).')
+	parser.add_argument('--evict', action='store_true', help='Keep a flow tag per slot and restart the slot for another flow, instead of sharing it.')
+	parser.add_argument('--timeout', type=float, default=0, help='Seconds without packets after which a slot starts a new flow (Default: 0 = never).')
+	parser.add_argument('--activity_timeout', type=float, default=5, help='Seconds without packets that end an active period, for the Active and Idle features (Default: 5).')
+	parser.add_argument('--batch_size', type=int, default=1 << 20, help='Packets per vectorized batch (Default: 1048576).')
+	args = parser.parse_args()
+
+	if args.features is not None:
+		features = args.features.split(',')
+	elif args.spec is not None:
+		f = open(args.spec)
+		spec = json.load(f)
+		f.close()
+		features = [name for name in spec['switch_features'] if name in FEATURES]
+		skipped = [name for name in spec['switch_features'] if name not in FEATURES]
+		if len(skipped) > 0:
+			print('Warning: Not computed from packets:', ', '.join(skipped))
+	else:
+		features = list(FEATURES)
+
+	unknown = [name for name in features if name not in FEATURES]
+	if len(unknown) > 0 or len(features) == 0:
+		parser.error('no features to compute' if len(features) == 0 else 'unsupported features: ' + ', '.join(unknown))
+
+	table = FlowTable(args.slots, features, args.hash, args.evict, int(args.timeout * 1000000), int(args.activity_timeout * 1000000))
+	writer = SnapshotWriter(args.output_dir, PACKET_COLUMNS + features)
+	start = time.perf_counter()
+	packets = extract_features(args.pcap_filenames.split(','), table, args.batch_size, writer)
+	writer.close()
+	elapsed = time.perf_counter() - start
+	print('Packets:', packets, '| Occupied slots:', table.occupied(), '/', args.slots, '| Time (s): {:.1f} | Packets/s: {:.0f}'.format(elapsed, packets / elapsed if elapsed > 0 else 0))
+
+if __name__ == '__main__':
+	main()
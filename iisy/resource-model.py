@@ -1,5 +1,6 @@
 import math
 import argparse
+import functools
 
 def proposition_1_example(n, d, k):
 	num_leaves = 2 ** d
@@ -9,19 +10,24 @@ def proposition_1_example(n, d, k):
 	print('Leaf table size:', leaf_table_size)
 	print('Total size:', (n * feature_table_size) + leaf_table_size)
 
+@functools.lru_cache(maxsize=None)
 def proposition_2_depth(n, k):
 	return n +  math.ceil(math.log2(k))
 
+@functools.lru_cache(maxsize=None)
 def proposition_2_num_leaf_nodes(n, k):
 	return (n ** 2) + (n * (k - 3)) + 2
 
+@functools.lru_cache(maxsize=None)
 def proposition_2_num_tcam_entries_An2(n, k):
 	m = math.ceil(math.log2(k - 1))
 	return m ** (n - 1)
 
+@functools.lru_cache(maxsize=None)
 def proposition_2_num_sram_entries_An2(n, k):
 	return (k - 1) ** (n - 1)
 
+@functools.lru_cache(maxsize=None)
 def proposition_2_num_sram_total(n, N, k):
 	if n == 1:
 		return (N * (k - 1))
@@ -35,6 +41,7 @@ def proposition_2_num_sram_total(n, N, k):
 	
 	return total + proposition_2_num_sram_total(n - 1, N, k)
 
+@functools.lru_cache(maxsize=None)
 def proposition_2_num_tcam_total(n, N, k):
 	if n == 1:
 		return (N * (k - 1))
@@ -1,65 +1,7 @@
 import argparse
 
-def int_to_binary_str(n, width):
-	binary = ''
-	i = 1 << (width - 1)
-	while i > 0:
-		if (n & i) != 0:
-			binary += '1'
-		else :
-			binary += '0'
-
-		i = i // 2
-	return binary
-			
-def collapse_wildcard_pair(a, b, width):
-	a = list(a)
-	num_match = 0
-	wildcard_ind = -1
-	for i in range(len(a) -1, -1, -1):
-		if wildcard_ind == -1 and a[i] != b[i]:
-			wildcard_ind = i
-		if a[i] == b[i]:
-			num_match += 1
-	
-	if num_match == (width - 1) and wildcard_ind != -1:
-		a[wildcard_ind] = '*'
-		return ''.join(a)
-	return None
-
-def collapse_adjacent(strs, width):
-	i = 0
-	j = 1
-	collapsed_last_round = False
-	while len(strs) > 1:
-		s = strs[i]
-		s2 = strs[j]
-		collapsed = collapse_wildcard_pair(s, s2, width)
-		if collapsed:
-			strs.remove(s)
-			strs.remove(s2)
-			strs.insert(i, collapsed)
-			collapsed_last_round = True
-		else:
-			i += 1
-			j += 1
-
-		if j >= len(strs):
-			if collapsed_last_round:
-				i = 0
-				j = 1
-				collapsed_last_round = False
-			else:
-				break
-
-	return strs
-
-def tcam_rules_range(lower, upper, width):
-	numbers_less_than = []
-	for i in range(lower, upper + 1):
-		numbers_less_than.append(int_to_binary_str(i, width))
-
-	return collapse_adjacent(numbers_less_than, width)
+import leo_path
+from leo_ranges import ranges_to_prefixes, prefix_to_str, min_ternary_cover
 
 def special_example_split_largest_into_halves(lower, upper, num_splits):
 	if num_splits < 1:
@@ -101,11 +43,12 @@ def main():
 
 	print('{0:22} | {1:15} | {2}'.format('Leaf Range', '# of TCAM rules', 'TCAM Rules'))
 	config = special_example_split_largest_into_halves(lower, args.upper_lim, splits)
+	range_ids, values, masks = ranges_to_prefixes([s[0] for s in config], [s[1] for s in config], args.width)
 	breakdown = ''
 	total = 0
 	maxx = 0
-	for split in config:
-		tcam = tcam_rules_range(split[0], split[1], args.width)
+	for i, split in enumerate(config):
+		tcam = [prefix_to_str(v, m, args.width) for v, m in zip(values[range_ids == i], masks[range_ids == i])]
 		breakdown += "{0:6} >= AND <= {1:5} | {2:15} | {3}\n".format(split[0], split[1], len(tcam), str(tcam))
 		total += len(tcam)
 		if len(tcam) > maxx:
@@ -113,7 +56,11 @@ def main():
 
 	print(breakdown)
 	print('Total rules:', total)
-	print('Total rules exluding largest split (as default rule):', (total - maxx))
+	print('Total rules with the largest split as default rule:', total - maxx + 1)
+
+	cover = min_ternary_cover([s[0] for s in config], [s[1] for s in config], args.width)
+	print('Optimized prioritized ternary rules:', len(cover))
+	print('Savings: {} vs. all splits, {} vs. largest split as default rule'.format(total - len(cover), (total - maxx + 1) - len(cover)))
 	print('=============================================================================================')
 
 if __name__ == '__main__':
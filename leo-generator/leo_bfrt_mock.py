@@ -0,0 +1,246 @@
+import argparse
+import re
+import time
+
+# Rough costs of a control plane push, measure them on the target switch for absolute numbers
+DEFAULT_CALL_LATENCY = 0.0005
+DEFAULT_ENTRY_LATENCY = 0.00002
+
+def p4_widths(p4_code):
+	# Width in bits of every #define, typedef and header field, None if it cannot be resolved
+	defines = dict((name, int(value)) for name, value in re.findall(r'#define\s+(\w+)\s+(\d+)', p4_code))
+
+	def width(type_name):
+		m = re.fullmatch(r'bit<\s*(\w+)\s*>', type_name.strip())
+		if m is None:
+			return typedefs.get(type_name.strip())
+		value = m.group(1)
+		return int(value) if value.isdigit() else defines.get(value)
+
+	typedefs = {}
+	for type_name, name in re.findall(r'typedef\s+(bit<\s*\w+\s*>)\s+(\w+)\s*;', p4_code):
+		typedefs[name] = width(type_name)
+
+	headers = {}
+	for name, body in re.findall(r'(?:header|struct)\s+(\w+)\s*\{(.*?)\}', p4_code, re.DOTALL):
+		headers[name] = dict((field, type_name) for type_name, field in re.findall(r'([\w<>]+)\s+(\w+)\s*;', body))
+
+	def field_width(path):
+		# hdr.leo.feature_1 -> the instance leo of header_t, then its field
+		parts = path.split('.')
+		type_name = 'header_t'
+		for part in parts[1:]:
+			fields = headers.get(type_name)
+			if fields is None or part not in fields:
+				return None
+			type_name = fields[part]
+		return width(type_name)
+
+	return width, field_width
+
+def parse_tables(p4_code):
+	# {control: {table: (keys, actions, size)}}, keys as (field, match kind, width) and actions as
+	# {action: [parameter widths]}, straight from the generated P4 program
+	width, field_width = p4_widths(p4_code)
+	controls = [(m.start(), m.group(1)) for m in re.finditer(r'control\s+(\w+)\s*\(', p4_code)]
+
+	def control_at(pos):
+		name = None
+		for start, control in controls:
+			if start < pos:
+				name = control
+		return name
+
+	actions = {}
+	for m in re.finditer(r'action\s+(\w+)\s*\((.*?)\)', p4_code, re.DOTALL):
+		params = [width(p.strip().rsplit(None, 1)[0]) for p in m.group(2).split(',') if p.strip() != '']
+		actions[(control_at(m.start()), m.group(1))] = params
+
+	tables = {}
+	table_re = r'table\s+(\w+)\s*\{\s*key\s*=\s*\{(.*?)\}\s*actions\s*=\s*\{(.*?)\}\s*size\s*=\s*(\d+)\s*;'
+	for m in re.finditer(table_re, p4_code, re.DOTALL):
+		control = control_at(m.start())
+		keys = [(field, kind, field_width(field)) for field, kind in re.findall(r'([\w.]+)\s*:\s*(\w+)\s*;', m.group(2))]
+		table_actions = {}
+		for action in re.findall(r'(\w+)\s*;', m.group(3)):
+			table_actions[action] = actions.get((control, action), [])
+		tables.setdefault(control, {})[m.group(1)] = (keys, table_actions, int(m.group(4)))
+
+	return tables
+
+class MockTable:
+	# Stand-in for a bfrt table: table.add_with_<action>(*keys, *params) and friends, with the
+	# positional layout of the generated control plane code. Ternary keys take a value and a mask,
+	# and tables with ternary keys take the match priority after the keys.
+	def __init__(self, runtime, name, keys, actions, size):
+		self.runtime = runtime
+		self.name = name
+		self.key_widths = []
+		for field, kind, width in keys:
+			self.key_widths.append(width)
+			if kind in ('ternary', 'range', 'lpm'):
+				self.key_widths.append(width)
+		self.has_priority = any(kind != 'exact' for field, kind, width in keys)
+		if self.has_priority:
+			self.key_widths.append(None)
+		self.actions = actions
+		self.size = size
+		self.entries = {}
+		self.default = None
+		self.peak = 0
+
+	def __getattr__(self, name):
+		for prefix, op in [('add_with_', self.add), ('mod_with_', self.mod), ('set_default_with_', self.set_default)]:
+			if name.startswith(prefix) and name[len(prefix):] in self.actions:
+				action = name[len(prefix):]
+				return lambda *args: op(action, args)
+		raise AttributeError(self.name + ' has no ' + name)
+
+	def check(self, args, widths, what):
+		if len(args) != len(widths):
+			raise ValueError(self.name + ': ' + what + ' takes ' + str(len(widths)) + ' values, got ' + str(len(args)))
+		for v, w in zip(args, widths):
+			if w is not None and not 0 <= v < (1 << w):
+				raise ValueError(self.name + ': ' + str(v) + ' does not fit ' + str(w) + ' bits in ' + what)
+
+	def split(self, action, args):
+		key = tuple(args[:len(self.key_widths)])
+		params = tuple(args[len(self.key_widths):])
+		self.check(key, self.key_widths, 'the key')
+		self.check(params, self.actions[action], action)
+		return key, params
+
+	def add(self, action, args):
+		key, params = self.split(action, args)
+		if key in self.entries:
+			raise ValueError(self.name + ': entry ' + str(key) + ' already exists')
+		if len(self.entries) >= self.size:
+			raise ValueError(self.name + ' is full, it holds ' + str(self.size) + ' entries')
+		self.entries[key] = (action, params)
+		self.peak = max(self.peak, len(self.entries))
+		self.runtime.charge('add', 1)
+
+	def mod(self, action, args):
+		key, params = self.split(action, args)
+		if key not in self.entries:
+			raise ValueError(self.name + ': entry ' + str(key) + ' does not exist')
+		self.entries[key] = (action, params)
+		self.runtime.charge('mod', 1)
+
+	def delete(self, *args):
+		key = tuple(args)
+		self.check(key, self.key_widths, 'the key')
+		if key not in self.entries:
+			raise ValueError(self.name + ': entry ' + str(key) + ' does not exist')
+		del self.entries[key]
+		self.runtime.charge('delete', 1)
+
+	def clear(self):
+		# A single call, whatever the number of entries
+		self.entries.clear()
+		self.runtime.charge('clear', 0)
+
+	def set_default(self, action, args):
+		self.check(args, self.actions[action], action)
+		self.default = (action, tuple(args))
+		self.runtime.charge('set_default', 1)
+
+class MockNode:
+	# bfrt.<program>.pipe.<control>: attribute access only
+	def __init__(self, children):
+		self.__dict__.update(children)
+
+class MockBfrt:
+	# Stand-in for the bfrt object the generated code runs against. Every call costs call_latency
+	# and every entry entry_latency; between batch_begin() and batch_end(), the entries are sent in
+	# a single call. Time is modelled, nothing sleeps.
+	def __init__(self, p4_code, program='Leo', call_latency=DEFAULT_CALL_LATENCY, entry_latency=DEFAULT_ENTRY_LATENCY, batching=True):
+		self.tables = {}
+		controls = {}
+		for control, tables in parse_tables(p4_code).items():
+			children = {}
+			for name, (keys, actions, size) in tables.items():
+				children[name] = MockTable(self, control + '.' + name, keys, actions, size)
+				self.tables[control + '.' + name] = children[name]
+			controls[control] = MockNode(children)
+		setattr(self, program, MockNode({'pipe' : MockNode(controls)}))
+
+		self.call_latency = call_latency
+		self.entry_latency = entry_latency
+		self.batching = batching
+		self.in_batch = False
+		self.reset_stats()
+
+	def reset_stats(self):
+		self.elapsed = 0.0
+		self.calls = 0
+		self.ops = {}
+
+	def charge(self, op, entries):
+		self.ops[op] = self.ops.get(op, 0) + 1
+		self.elapsed += entries * self.entry_latency
+		if not self.in_batch:
+			self.calls += 1
+			self.elapsed += self.call_latency
+
+	def batch_begin(self):
+		self.in_batch = self.batching
+
+	def batch_end(self):
+		if self.in_batch:
+			self.calls += 1
+			self.elapsed += self.call_latency
+		self.in_batch = False
+
+	def run(self, code):
+		exec(code, {'bfrt' : self})
+
+	def entries(self):
+		# (table, action, keys, params) of every installed entry, as generate_rules lists them
+		rules = []
+		for name, table in self.tables.items():
+			for keys, (action, params) in table.entries.items():
+				rules.append((name.split('.')[-1], action, keys, params))
+		return rules
+
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program runs generated control plane code against a local model of the bfrt runtime, checks table sizes and key widths, and reports the install rate.')
+
+	parser.add_argument('--p4_filename', type=str, required=True, help='The P4 program written by leo_dataplane_generator.py.')
+	parser.add_argument('--code_filenames', type=str, required=True, help='Comma-separated control plane code files written by leo_ctrlplane_generator.py, run in order on the same tables (E.g.: an install, then updates).')
+	parser.add_argument('--call_latency', type=float, default=DEFAULT_CALL_LATENCY, help='Modelled seconds per runtime call (Default: ' + str(DEFAULT_CALL_LATENCY) + ').')
+	parser.add_argument('--entry_latency', type=float, default=DEFAULT_ENTRY_LATENCY, help='Modelled seconds per entry (Default: ' + str(DEFAULT_ENTRY_LATENCY) + ').')
+	parser.add_argument('--no_batch', action='store_true', help='Ignore bfrt.batch_begin() and bfrt.batch_end(), every entry is its own call.')
+	args = parser.parse_args()
+
+	f = open(args.p4_filename)
+	bfrt = MockBfrt(f.read(), call_latency=args.call_latency, entry_latency=args.entry_latency, batching=not args.no_batch)
+	f.close()
+
+	print('{:>24}  {:>8}  {:>8}  {:>8}  {:>8}  {:>14}  {:>14}  {:>12}'.format('Code', 'Added', 'Modified', 'Deleted', 'Calls', 'Modelled (ms)', 'Modelled ops/s', 'Exec ops/s'))
+	for filename in args.code_filenames.split(','):
+		f = open(filename)
+		code = f.read()
+		f.close()
+
+		bfrt.reset_stats()
+		start = time.perf_counter()
+		try:
+			bfrt.run(code)
+		except ValueError as e:
+			print('Error:', filename, '-', e)
+			return
+		wall = time.perf_counter() - start
+
+		ops = sum(n for op, n in bfrt.ops.items() if op in ('add', 'mod', 'delete'))
+		print('{:>24}  {:>8}  {:>8}  {:>8}  {:>8}  {:>14.1f}  {:>14.0f}  {:>12.0f}'.format(filename[-24:], bfrt.ops.get('add', 0), bfrt.ops.get('mod', 0),
+			bfrt.ops.get('delete', 0), bfrt.calls, bfrt.elapsed * 1000, ops / bfrt.elapsed if bfrt.elapsed > 0 else 0, ops / wall if wall > 0 else 0))
+
+	print('---')
+	for name, table in bfrt.tables.items():
+		if table.peak > 0:
+			print('{:>32}  {:>8} / {:<8}  (peak {})'.format(name, len(table.entries), table.size, table.peak))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,137 @@
+from leo_resource_model import leo_model
+from leo_templates import feature_widths_or_default
+
+import hashlib
+import json
+import os
+import shutil
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'leo')
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+# Any change to these files changes the generated programs, so they are part of the cache key
+GENERATOR_SOURCES = ['leo_dataplane_generator.py', 'leo_cache.py', 'leo_sram.py', 'leo_tcam.py', 'leo_templates.py', 'leo_resource_model.py']
+
+def generator_fingerprint():
+	digest = hashlib.sha256()
+	base_dir = os.path.dirname(os.path.abspath(__file__))
+	for name in GENERATOR_SOURCES:
+		f = open(os.path.join(base_dir, name), 'rb')
+		digest.update(f.read())
+		f.close()
+	return digest.hexdigest()
+
+def tree_class_params(is_sram, alu_config, num_features, leaf_limit, transient, feature_widths=None):
+	# Leo-SRAM tables do not depend on the leaf limit
+	return {
+		'mem_type' : 'sram' if is_sram else 'tcam',
+		'muxed_alu_config' : list(alu_config),
+		'features' : num_features,
+		'feature_widths' : feature_widths_or_default(num_features, feature_widths),
+		'leaf_limit' : 0 if is_sram else leaf_limit,
+		'transient' : transient,
+	}
+
+def leo_manifest(is_sram, alu_config, num_features, leaf_limit, transient, feature_widths=None):
+	params = tree_class_params(is_sram, alu_config, num_features, leaf_limit, transient, feature_widths)
+	table_sizes = leo_model(alu_config, is_sram, transient, leaf_limit=params['leaf_limit'])
+
+	tables = {}
+	for l in range(1, len(alu_config) + 1):
+		for a in range(1, alu_config[l - 1] + 1):
+			tables['layer_' + str(l) + '_' + str(a)] = table_sizes[l - 1]
+	tables['layer_' + str(len(alu_config) + 1) + '_1'] = table_sizes[len(alu_config)]
+
+	params['tables'] = tables
+	return params
+
+def manifest_filename(filename):
+	return os.path.splitext(filename)[0] + '.manifest.json'
+
+def write_manifest(manifest, filename):
+	f = open(filename, 'w')
+	json.dump(manifest, f, indent=4)
+	f.close()
+
+def load_manifest(filename):
+	f = open(filename)
+	manifest = json.load(f)
+	f.close()
+	return manifest
+
+def check_rules_against_manifest(rules, manifest, verbose=True):
+	counts = {}
+	for table, action, keys, params in rules:
+		counts[table] = counts.get(table, 0) + 1
+
+	fits = True
+	for table, count in counts.items():
+		if table not in manifest['tables']:
+			if verbose:
+				print('Error:', table, 'is not part of the data plane')
+			fits = False
+		elif count > manifest['tables'][table]:
+			if verbose:
+				print('Error:', table, 'needs', count, 'entries but its size is', manifest['tables'][table])
+			fits = False
+	return fits
+
+class ProgramCache:
+	# Content-addressed store of generated programs: <key>.p4 and its <key>.json manifest.
+	# Entries are touched on every hit and the least recently used are evicted past max_size bytes.
+	def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE):
+		self.cache_dir = cache_dir
+		self.max_size = max_size
+		os.makedirs(cache_dir, exist_ok=True)
+
+	def key(self, params):
+		digest = hashlib.sha256()
+		digest.update(json.dumps(params, sort_keys=True).encode())
+		digest.update(generator_fingerprint().encode())
+		return digest.hexdigest()
+
+	def paths(self, key):
+		return os.path.join(self.cache_dir, key + '.p4'), os.path.join(self.cache_dir, key + '.json')
+
+	def get(self, key, filename):
+		program, manifest = self.paths(key)
+		if not (os.path.exists(program) and os.path.exists(manifest)):
+			return None
+
+		shutil.copyfile(program, filename)
+		os.utime(program)
+		os.utime(manifest)
+		manifest = load_manifest(manifest)
+		self.evict()
+		return manifest
+
+	def put(self, key, filename, manifest):
+		program, manifest_path = self.paths(key)
+		# Write under a temporary name first so concurrent runs never see a partial entry
+		tmp = '.' + str(os.getpid()) + '.tmp'
+		shutil.copyfile(filename, program + tmp)
+		write_manifest(manifest, manifest_path + tmp)
+		os.replace(program + tmp, program)
+		os.replace(manifest_path + tmp, manifest_path)
+		self.evict()
+
+	def evict(self):
+		entries = []
+		total = 0
+		for name in os.listdir(self.cache_dir):
+			if not name.endswith('.p4'):
+				continue
+			program, manifest = self.paths(name[:-len('.p4')])
+			if not os.path.exists(manifest):
+				continue
+			size = os.path.getsize(program) + os.path.getsize(manifest)
+			entries.append((os.path.getmtime(program), size, program, manifest))
+			total += size
+
+		entries.sort()
+		for last_used, size, program, manifest in entries:
+			if total <= self.max_size:
+				break
+			os.remove(program)
+			os.remove(manifest)
+			total -= size
@@ -1,180 +1,811 @@
+import argparse
+import hashlib
+import itertools
+import json
 import math
-import importlib 
+import os
 import sys
+from collections import deque
+import numpy as np
 from leo_templates import *
+from leo_resource_model import leo_model, uniform_alu_config, args_type_for_number_list
+from leo_cache import load_manifest, check_rules_against_manifest
+from leo_quantization import max_feature_value, clip_quantization, load_quantization, quantize_tree, feature_transform
 
-class InternalNode:
-	def __init__(self, feature, constraint, depth):
-		self.feature = feature
-		self.constraint = constraint
-		self.depth = depth
-		self.left = None
-		self.right = None
-
-class LeafNode:
-	def __init__(self, label, depth):
-		self.label = label
-		self.depth = depth
+# Bit tested by the stateless AND ALUs (and the TCAM keys) in the data plane
+ALU_SIGN_BIT = 32768
 
 class Tree:
-	def __init__(self, node):
-		self.root = node
+	# Struct-of-arrays tree, one row per node with the root at index 0.
+	# Leaves have left == right == feature == -1, internal nodes have label == -1.
+	def __init__(self, feature, constraint, left, right, depth, label, feature_names):
+		self.feature = np.asarray(feature, dtype=np.int32)
+		self.constraint = np.asarray(constraint, dtype=np.int64)
+		self.left = np.asarray(left, dtype=np.int32)
+		self.right = np.asarray(right, dtype=np.int32)
+		self.depth = np.asarray(depth, dtype=np.int16)
+		self.label = np.asarray(label, dtype=np.int32)
+		self.feature_names = list(feature_names)
+		self.root = 0
+
+	def num_nodes(self):
+		return len(self.left)
+
+	def is_leaf(self, node):
+		return self.left[node] == -1
 
 	def print_tree(self, node, level, prefix='ROOT'):
-		if node is not None:
-			if type(node) == InternalNode:
-				print('|   ' * level + prefix, node.feature, node.constraint)
-				if node.left is not None or node.right is not None:
-					self.print_tree(node.left, level + 1, 'L   ')
-					self.print_tree(node.right, level + 1, 'R   ')
+		if node is not None and node != -1:
+			if not self.is_leaf(node):
+				print('|   ' * level + prefix, self.feature_names[self.feature[node]], self.constraint[node])
+				self.print_tree(self.left[node], level + 1, 'L   ')
+				self.print_tree(self.right[node], level + 1, 'R   ')
 			else:
-				print('|   ' * level + prefix, node.label)
+				print('|   ' * level + prefix, self.label[node])
+
+	def predict(self, X):
+		# X has one column per entry of feature_names
+		X = np.asarray(X)
+		rows = np.arange(len(X))
+		node = np.zeros(len(X), dtype=np.int64)
+		internal = self.left[node] != -1
+		while internal.any():
+			r = rows[internal]
+			n = node[r]
+			go_right = X[r, self.feature[n]] > self.constraint[n]
+			node[r] = np.where(go_right, self.right[n], self.left[n])
+			internal = self.left[node] != -1
+
+		return self.label[node]
 
 def parse_line(line):
-	line = line.replace('|---', '|   ')
+	line = line.rstrip().replace('|---', '|   ')
 	depth = line.count('|   ')
-	leaf = 'class' in line
+	leaf = 'class:' in line
 	line = line.strip('|   ')
-	line = line.split(' ')
+	line = line.split()
 	if leaf:
-		label = int(line[1])
+		# Handles both 'class: 1' and 'weights: [...] class: 1'
+		label = int(line[line.index('class:') + 1])
 		return (leaf, depth, label)
 	else:
 		feature = line[0]
 		condition = line[1]
-		constraint = int(round(float(line[-1])))
+		constraint = math.floor(float(line[-1]))
 		return (leaf, depth, feature, condition, constraint)
 
-def find_my_right(node_lines, line_num, depth):
-	for i in range(line_num, len(node_lines)):
-		if node_lines[i][1] == depth:
-			return i
-
-	return None
-
-def build_tree_recursive(node_lines, node, line_num):
-	if line_num >= len(node_lines):
-		return None
-
-	tup = node_lines[line_num]
-	if tup[0]:
-		return None
-	else:
-		right_subtree_line_num = 1 + find_my_right(node_lines, line_num + 1, tup[1])
-		right_node = node_lines[right_subtree_line_num]
-		left_node = node_lines[line_num + 1]
-		
-		if left_node[0]:
-			node.left = LeafNode(left_node[2], left_node[1])
-		else:
-			node.left = InternalNode(left_node[2], left_node[4], left_node[1])
-			build_tree_recursive(node_lines, node.left, line_num + 1)
+def build_tree_from_file(file):
+	feature = []
+	constraint = []
+	left = []
+	right = []
+	depths = []
+	label = []
+	feature_names = []
+	feature_ids = {}
+
+	# open_nodes[d - 1] is the internal node at depth d whose children are being read
+	open_nodes = []
 
-		if right_node[0]:
-			node.right = LeafNode(right_node[2], right_node[1])
+	f = open(file, 'r')
+	for line in f:
+		if line.strip() == '':
+			continue
+		# export_text(...) stops at max_depth (10 by default) and only notes the depth of the missing sub-tree
+		if 'truncated branch' in line:
+			f.close()
+			raise ValueError(file + ': the tree was exported with a max_depth below its depth (' + line.strip(' |-\n') + '), export it again with export_text(..., max_depth=model.get_depth())')
+
+		tup = parse_line(line)
+		leaf = tup[0]
+		depth = tup[1]
+
+		# The '>' line of a split only announces its right sub-tree
+		if not leaf and tup[3] != '<=':
+			continue
+
+		node = len(left)
+		left.append(-1)
+		right.append(-1)
+		depths.append(depth)
+		if leaf:
+			feature.append(-1)
+			constraint.append(0)
+			label.append(tup[2])
 		else:
-			node.right = InternalNode(right_node[2], right_node[4], right_node[1])
-			build_tree_recursive(node_lines, node.right, right_subtree_line_num)
-		
-		return node
+			if tup[2] not in feature_ids:
+				feature_ids[tup[2]] = len(feature_names)
+				feature_names.append(tup[2])
+			feature.append(feature_ids[tup[2]])
+			constraint.append(tup[4])
+			label.append(-1)
+
+		if depth > 1:
+			parent = open_nodes[depth - 2]
+			if left[parent] == -1:
+				left[parent] = node
+			else:
+				right[parent] = node
 
-def build_tree_from_file(file):
-	f = open(file, 'r')
-	lines = f.readlines()
+		if not leaf:
+			del open_nodes[depth - 1:]
+			open_nodes.append(node)
 	f.close()
 
-	nodes = []
-	for line in lines:
-		nodes.append(parse_line(line))
+	tree = Tree(feature, constraint, left, right, depths, label, feature_names)
+	return tree
+
+def build_tree_from_sklearn(model, feature_names=None):
+	sk_tree = model.tree_
+	left = sk_tree.children_left
+	right = sk_tree.children_right
+	is_leaf = left == -1
 
-	root = InternalNode(nodes[0][2], nodes[0][4], nodes[0][1])
-	build_tree_recursive(nodes, root, 0)
-	tree = Tree(root)
+	if feature_names is None:
+		if hasattr(model, 'feature_names_in_'):
+			feature_names = list(model.feature_names_in_)
+		else:
+			feature_names = ['feature_' + str(i) for i in range(sk_tree.n_features)]
+
+	# Features are integers, so 'x <= t' is the same test as 'x <= floor(t)'
+	constraints = np.where(is_leaf, 0, np.floor(sk_tree.threshold)).astype(np.int64)
+	labels = model.classes_[np.argmax(sk_tree.value[:, 0, :], axis=1)]
+	labels = np.where(is_leaf, labels, -1)
+
+	# Depth of every node, one tree level at a time
+	depths = np.zeros(sk_tree.node_count, dtype=np.int16)
+	level = np.array([0])
+	d = 1
+	while level.size > 0:
+		depths[level] = d
+		level = np.concatenate((left[level], right[level]))
+		level = level[level != -1]
+		d += 1
+
+	tree = Tree(np.where(is_leaf, -1, sk_tree.feature), constraints, left, right, depths, labels, feature_names)
 	return tree
 
-def find_k_children(node, k):
+def bfs_internal_nodes(tree):
+	levels = []
+	level = np.array([tree.root])
+	level = level[tree.left[level] != -1]
+	while level.size > 0:
+		levels.append(level)
+		# Interleave so that each left child is directly followed by its right sibling
+		level = np.stack((tree.left[level], tree.right[level]), axis=1).ravel()
+		level = level[tree.left[level] != -1]
+
+	return np.concatenate(levels) if levels else level
+
+def find_k_children(left, right, node, k):
 	children = []
-	queue = [node]
+	queue = deque([node])
 	while len(queue) > 0:
-		cur_node = queue.pop(0)
+		cur_node = queue.popleft()
 		children.append(cur_node)
 		if len(children) == k:
 			break
 
-		if type(cur_node.left) == InternalNode:
-			queue.append(cur_node.left)
+		if left[left[cur_node]] != -1:
+			queue.append(left[cur_node])
 
-		if type(cur_node.right) == InternalNode:
-			queue.append(cur_node.right)
+		if left[right[cur_node]] != -1:
+			queue.append(right[cur_node])
 
 	return children
 
-def sub_tree_splitter(root, K):
-	bfs_sorted_nodes = []
+def sub_tree_splitter(tree, alu_config):
+	bfs_sorted_nodes = bfs_internal_nodes(tree).tolist()
+	left = tree.left.tolist()
+	right = tree.right.tolist()
 
-	bfs_queue = [root]
-	while len(bfs_queue) > 0:
-		node = bfs_queue.pop(0)
-		bfs_sorted_nodes.append(node)
+	parent = [-1] * len(left)
+	for node in bfs_sorted_nodes:
+		parent[left[node]] = node
+		parent[right[node]] = node
+	group_of = [0] * len(left)
+	group_layer = []
 
-		if type(node.left) == InternalNode:
-			bfs_queue.append(node.left)
-		if type(node.right) == InternalNode:
-			bfs_queue.append(node.right)
+	# Nodes are marked as grouped by BFS position instead of being removed from the list
+	bfs_index = [0] * len(left)
+	for i, node in enumerate(bfs_sorted_nodes):
+		bfs_index[node] = i
+	grouped = bytearray(len(bfs_sorted_nodes))
 
 	sub_groups = []
-	while len(bfs_sorted_nodes) > 0:
-		node = bfs_sorted_nodes[0]
-		children = find_k_children(node, K)
-		sub_groups.append(children)
+	next_ungrouped = 0
+	while next_ungrouped < len(bfs_sorted_nodes):
+		node = bfs_sorted_nodes[next_ungrouped]
+		# The parent's sub-group is always formed first, the group runs one layer after it
+		if parent[node] == -1:
+			layer = 1
+		else:
+			layer = group_layer[group_of[parent[node]]] + 1
+		# Groups past the last layer are reported by assign_rule_to_layers
+		K = alu_config[min(layer, len(alu_config)) - 1]
+
+		children = find_k_children(left, right, node, K)
 		for c in children:
-			bfs_sorted_nodes.remove(c)
+			grouped[bfs_index[c]] = 1
+			group_of[c] = len(sub_groups)
+		sub_groups.append(children)
+		group_layer.append(layer)
+
+		while next_ungrouped < len(bfs_sorted_nodes) and grouped[next_ungrouped]:
+			next_ungrouped += 1
 
 	return sub_groups
 
-def assign_rule_to_layers(sub_groups, subtree_layer_limits):
+def assign_rule_to_layers(tree, sub_groups, subtree_layer_limits, verbose=True):
+	group_of = [0] * tree.num_nodes()
+	for i, group in enumerate(sub_groups):
+		for node in group:
+			group_of[node] = i
+
+	parent = [-1] * tree.num_nodes()
+	for node in np.flatnonzero(tree.left != -1).tolist():
+		parent[tree.left[node]] = node
+		parent[tree.right[node]] = node
+
+	# A sub-group runs one layer after the sub-group holding its root's parent
+	group_layer = []
+	for group in sub_groups:
+		if parent[group[0]] == -1:
+			group_layer.append(1)
+		else:
+			group_layer.append(group_layer[group_of[parent[group[0]]]] + 1)
+
 	assigned_layers = []
+	fits = True
 	for layer in range(1, len(subtree_layer_limits) + 1):
 		layer_limit = subtree_layer_limits[layer - 1]
-		print('Layer', layer, '| Available space:', layer_limit)
+		if verbose:
+			print('Layer', layer, '| Available space:', layer_limit)
 		curr_group = []
-		for i in range(layer_limit):
-			if len(sub_groups) != 0:
-				rule = sub_groups.pop(0)
+		for i in range(len(sub_groups)):
+			if group_layer[i] == layer:
+				rule = sub_groups[i]
 				curr_group.append(rule)
-				for r in rule:
-					print(r.feature, r.constraint, end=', '	)
-				print()
+				if verbose:
+					for r in rule:
+						print(tree.feature_names[tree.feature[r]], tree.constraint[r], end=', '	)
+					print()
+
+		if len(curr_group) > layer_limit:
+			if verbose:
+				print('Error: Layer', layer, 'needs', len(curr_group), 'sub-trees but only has space for', layer_limit)
+			fits = False
 
 		assigned_layers.append((layer, curr_group))
 
-	if len(sub_groups) > 0:
-		print('Error: Not all rules were assigned to a layer')
+	if len(group_layer) > 0 and max(group_layer) > len(subtree_layer_limits):
+		if verbose:
+			print('Error: Not all rules were assigned to a layer')
+		fits = False
+
+	if not fits:
+		return None
 
 	return assigned_layers
 
-def generate_runtime_code(layers, k):
-	for layer in layers:
-		for alu in range(1, k + 1):
-			clear_table = clear_table_t.substitute(layer_id=layer[0], alu=alu)
-			print(clear_table)
+def alu_constraint(threshold, sign_bit=ALU_SIGN_BIT):
+	# The ALU adds the constraint to the feature and keeps only the sign bit,
+	# which ends up set (go right) exactly when feature > threshold
+	return min(max(sign_bit - 1 - threshold, 0), sign_bit)
+
+def group_exits(left, right, group):
+	alu_of = {node: a for a, node in enumerate(group)}
+	exits = []
+	stack = [(group[0], ())]
+	while len(stack) > 0:
+		node, path = stack.pop()
+		if node in alu_of:
+			stack.append((right[node], path + ((alu_of[node], True),)))
+			stack.append((left[node], path + ((alu_of[node], False),)))
+		else:
+			exits.append((path, node))
+
+	return exits
+
+def alu_keys(path, num_alus, is_sram, sign_bit=ALU_SIGN_BIT):
+	went_right = dict(path)
+	if is_sram:
+		# Exact match on every ALU result, ALUs off the path can hold either value
+		values = []
+		for a in range(num_alus):
+			if a in went_right:
+				values.append((sign_bit if went_right[a] else 0,))
+			else:
+				values.append((0, sign_bit))
+		return list(itertools.product(*values))
 
-def main():	
-	filename = 'tree-example.txt'
-	k = 2
-	num_layers = 3
+	keys = ()
+	for a in range(num_alus):
+		if a in went_right:
+			keys += (sign_bit if went_right[a] else 0, sign_bit)
+		else:
+			keys += (0, 0)
+	return [keys]
+
+def generate_rules(tree, layers, alu_config, is_sram, transient, tree_id=0, sign_bit=ALU_SIGN_BIT, feature_slots=None, group_ids=None):
+	left = tree.left.tolist()
+	right = tree.right.tolist()
+	# feature_slots[f] is the header feature holding tree feature f
+	if feature_slots is None:
+		feature_slots = list(range(len(tree.feature_names)))
+	feature = [feature_slots[f] if f != -1 else -1 for f in tree.feature.tolist()]
+	constraint = tree.constraint.tolist()
+	label = tree.label.tolist()
+	num_layers = len(layers)
+
+	# group_ids[l][i] is the id the i-th sub-group of layer l + 1 writes to its layer result
+	if group_ids is None:
+		group_ids = [list(range(1, len(groups) + 1)) for layer, groups in layers]
+	targets = {}
+	for (layer, groups), ids in zip(layers, group_ids):
+		for group_id, group in zip(ids, groups):
+			targets[group[0]] = (group_id, group)
+
+	def set_group(rules, layer, keys, group_id, group):
+		for a, node in enumerate(group, 1):
+			action = 'set_' + str(layer) + '_' + str(a) + '_feature' + str(feature[node] + 1)
+			params = (alu_constraint(constraint[node], sign_bit),)
+			if a == 1 and layer > 1:
+				params = (group_id,) + params
+			rules.append(('layer_' + str(layer) + '_' + str(a), action, keys, params))
+
+	rules = []
+	if is_sram:
+		tree_id_key = (tree_id,)
+		priority = ()
+	else:
+		tree_id_key = (tree_id, 1)
+		priority = (0,)
+
+	# Layer 1 holds the root sub-tree, selected by tree_id only
+	set_group(rules, 1, tree_id_key + priority, 1, layers[0][1][0])
+
+	for (layer, groups), ids in zip(layers, group_ids):
+		next_layer = layer + 1
+		for group_id, group in zip(ids, groups):
+			prefix = ()
+			# The leaf table never matches on tree_id, even when it is layer 2
+			if transient and next_layer == 2 and num_layers > 1:
+				prefix += tree_id_key
+			if next_layer > 2:
+				prefix += (group_id,) if is_sram else (group_id, 0xffff)
+
+			for path, target in group_exits(left, right, group):
+				for keys in alu_keys(path, alu_config[layer - 1], is_sram, sign_bit):
+					keys = prefix + keys + priority
+					if left[target] == -1:
+						rules.append(('layer_' + str(next_layer) + '_1', 'set_leaf', keys, (label[target],)))
+					else:
+						target_id, target_group = targets[target]
+						set_group(rules, next_layer, keys, target_id, target_group)
+
+	return rules
+
+def entries_code(template, rules, with_params=True):
+	# One loop per (table, action) instead of a statement per entry
+	batches = {}
+	for table, action, keys, params in rules:
+		if with_params:
+			batches.setdefault((table, action), []).append(keys + params)
+		else:
+			batches.setdefault((table, None), []).append(keys)
+
+	code = []
+	for (table, action), entries in batches.items():
+		entries = ',\n\t'.join('(' + ','.join(str(v) for v in e) + ',)' for e in entries)
+		code.append(template.substitute(table=table, action=action, entries=entries))
+	return code
+
+def generate_runtime_code(rules, alu_config, transient):
+	num_layers = len(alu_config)
+	code = []
+	# Transient updates install next to the active tree, so nothing is cleared
+	if not transient:
+		for layer in range(1, num_layers + 1):
+			for alu in range(1, alu_config[layer - 1] + 1):
+				code.append(clear_table_t.substitute(layer_id=layer, alu=alu))
+		code.append(clear_table_t.substitute(layer_id=num_layers + 1, alu=1))
+
+	code.append(batch_begin)
+	code += entries_code(add_entries_t, rules)
+	code.append(batch_end)
+
+	return code
+
+def group_signatures(tree, layers, sign_bit=ALU_SIGN_BIT, feature_slots=None):
+	# Two signatures per sub-group, by its root. 'own' covers the entries keyed on the group's id:
+	# where each exit leads, a label or the ALUs of the next sub-group. 'subtree' also covers every
+	# sub-group below, so groups with the same subtree signature and ids install identical entries.
+	left = tree.left.tolist()
+	right = tree.right.tolist()
+	if feature_slots is None:
+		feature_slots = list(range(len(tree.feature_names)))
+	feature = tree.feature.tolist()
+	constraint = tree.constraint.tolist()
+	label = tree.label.tolist()
+
+	alus = {}
+	for layer, groups in layers:
+		for group in groups:
+			alus[group[0]] = tuple((feature_slots[feature[node]], alu_constraint(constraint[node], sign_bit)) for node in group)
+
+	own = {}
+	subtree = {}
+	children = {}
+	for layer, groups in reversed(layers):
+		for group in groups:
+			own_exits = []
+			subtree_exits = []
+			children[group[0]] = []
+			for path, target in group_exits(left, right, group):
+				if left[target] == -1:
+					own_exits.append((path, label[target]))
+					subtree_exits.append((path, label[target]))
+				else:
+					own_exits.append((path, alus[target]))
+					subtree_exits.append((path, subtree[target]))
+					children[group[0]].append(target)
+			own[group[0]] = hashlib.sha1(repr((alus[group[0]], own_exits)).encode()).hexdigest()
+			subtree[group[0]] = hashlib.sha1(repr((alus[group[0]], subtree_exits)).encode()).hexdigest()
+
+	return own, subtree, children
+
+def assign_group_ids(old_layers, old_group_ids, old_signatures, layers, signatures, transient):
+	# Sub-groups keep the id of an old sub-group with the same entries, so that those entries are
+	# left alone. With transient updates, both trees share the tables past layer 2 until the switch:
+	# a sub-group then only keeps an id if its whole subtree is unchanged, otherwise it takes an id
+	# the installed tree does not use.
+	old_own, old_subtree, old_children = old_signatures
+	own, subtree, children = signatures
+	forced = {}
+	group_ids = []
+	for l, (layer, groups) in enumerate(layers):
+		old_groups = old_layers[l][1] if l < len(old_layers) else []
+		old_id = {}
+		if l < len(old_layers):
+			old_id = {group[0] : group_id for group, group_id in zip(old_groups, old_group_ids[l])}
+		ids = [None] * len(groups)
+		matched = set()
+
+		def match(i, old_root, whole):
+			ids[i] = old_id[old_root]
+			matched.add(old_root)
+			# The sub-groups below an unchanged subtree keep the ids they are installed with
+			if whole:
+				for child, old_child in zip(children[groups[i][0]], old_children[old_root]):
+					forced[child] = old_child
+
+		for i, group in enumerate(groups):
+			if group[0] in forced:
+				match(i, forced[group[0]], True)
+
+		for new_signatures, old_signatures, whole in [(subtree, old_subtree, True), (own, old_own, False)]:
+			if transient and not whole:
+				break
+			candidates = {}
+			for group in old_groups:
+				if group[0] not in matched:
+					candidates.setdefault(old_signatures[group[0]], deque()).append(group[0])
+			for i, group in enumerate(groups):
+				if ids[i] is None and len(candidates.get(new_signatures[group[0]], ())) > 0:
+					match(i, candidates[new_signatures[group[0]]].popleft(), whole)
+
+		used = set(group_id for group_id in ids if group_id is not None)
+		if transient and layer > 1:
+			used.update(old_id.values())
+		next_id = 1
+		for i in range(len(ids)):
+			if ids[i] is None:
+				while next_id in used:
+					next_id += 1
+				ids[i] = next_id
+				used.add(next_id)
+		group_ids.append(ids)
+
+	return group_ids
+
+def diff_rules(old_rules, rules):
+	# Entries are identified by table and key, an entry in both with other action data is modified
+	old = {(table, keys) : (action, params) for table, action, keys, params in old_rules}
+	new_keys = set()
+	adds = []
+	mods = []
+	for table, action, keys, params in rules:
+		new_keys.add((table, keys))
+		if (table, keys) not in old:
+			adds.append((table, action, keys, params))
+		elif old[(table, keys)] != (action, params):
+			mods.append((table, action, keys, params))
+
+	deletes = [rule for rule in old_rules if (rule[0], rule[2]) not in new_keys]
+	return adds, mods, deletes
+
+def generate_update_code(adds, mods, deletes, transient, tree_id):
+	code = []
+	if transient:
+		# The new tree is staged under the inactive tree_id and becomes active with a single switch,
+		# then the entries only the old tree used are removed
+		code.append(batch_begin)
+		code += entries_code(add_entries_t, adds)
+		code.append(batch_end)
+		code.append(change_active_tree_t.substitute(tree_id=tree_id))
+		code.append(batch_begin)
+		code += entries_code(mod_entries_t, mods)
+		code += entries_code(delete_entries_t, deletes, False)
+		code.append(batch_end)
+	else:
+		# Deletes first, so that the tables never need room for both trees
+		code.append(batch_begin)
+		code += entries_code(delete_entries_t, deletes, False)
+		code += entries_code(mod_entries_t, mods)
+		code += entries_code(add_entries_t, adds)
+		code.append(batch_end)
+
+	return code
+
+def write_state(filename, tree, layers, group_ids, tree_id, feature_slots, feature_widths, mem_type, alu_config, transient):
+	# Everything needed to regenerate the installed entries on the next update
+	state = {
+		'mem_type' : mem_type,
+		'muxed_alu_config' : list(alu_config),
+		'transient' : transient,
+		'feature_widths' : list(feature_widths),
+		'tree_id' : tree_id,
+		'feature_slots' : feature_slots,
+		'tree' : {
+			'feature' : tree.feature.tolist(),
+			'constraint' : tree.constraint.tolist(),
+			'left' : tree.left.tolist(),
+			'right' : tree.right.tolist(),
+			'depth' : tree.depth.tolist(),
+			'label' : tree.label.tolist(),
+			'feature_names' : tree.feature_names,
+		},
+		'layers' : [groups for layer, groups in layers],
+		'group_ids' : group_ids,
+	}
+	f = open(filename, 'w')
+	json.dump(state, f)
+	f.close()
 
-	sys.path.append('..')
-	leo_resource_model = importlib.import_module('leo.resource-model')
+def load_state(filename):
+	f = open(filename)
+	state = json.load(f)
+	f.close()
+	state['tree'] = Tree(**state['tree'])
+	state['layers'] = [(l + 1, groups) for l, groups in enumerate(state['layers'])]
+	return state
+
+def feature_capacity(width, feature_widths):
+	# Largest threshold a feature of this width can be compared to, if its value saturates at
+	# 2^width - 1. The widest features share their top bit with the ALU sign bit.
+	if width < max(feature_widths):
+		return (1 << width) - 2
+	return (1 << (width - 1)) - 2
+
+def largest_thresholds(tree):
+	internal = tree.feature != -1
+	largest = np.full(len(tree.feature_names), -1, dtype=np.int64)
+	np.maximum.at(largest, tree.feature[internal], tree.constraint[internal])
+	return largest
+
+def assign_feature_slots(tree, feature_widths):
+	# Puts the tree features with the largest thresholds in the widest header features.
+	# Returns the header feature of every tree feature, or None if one does not fit.
+	if len(tree.feature_names) > len(feature_widths):
+		return None
+
+	largest = largest_thresholds(tree)
+	slots = sorted(range(len(feature_widths)), key=lambda i: -feature_widths[i])
+	feature_slots = [0] * len(tree.feature_names)
+	for f, slot in zip(sorted(range(len(largest)), key=lambda f: -largest[f]), slots):
+		if largest[f] > feature_capacity(feature_widths[slot], feature_widths):
+			return None
+		feature_slots[f] = slot
+	return feature_slots
+
+def pin_feature_slots(tree, feature_widths, old_feature_names, old_feature_slots, transient):
+	# Keeps every feature of the installed tree in its header feature, so an update does not change
+	# the feature extraction, and puts the new features in free ones, widest first. With transient
+	# updates, the slots of the active tree stay taken. Returns None if a feature does not fit.
+	if old_feature_slots is None:
+		old_feature_slots = list(range(len(old_feature_names)))
+	installed = dict(zip(old_feature_names, old_feature_slots))
+	feature_slots = [installed.get(name) for name in tree.feature_names]
+
+	taken = set(old_feature_slots) if transient else set(slot for slot in feature_slots if slot is not None)
+	free = sorted((i for i in range(len(feature_widths)) if i not in taken), key=lambda i: -feature_widths[i])
+	largest = largest_thresholds(tree)
+	new = sorted((f for f, slot in enumerate(feature_slots) if slot is None), key=lambda f: -largest[f])
+	if len(new) > len(free):
+		return None
+	for f, slot in zip(new, free):
+		feature_slots[f] = slot
+
+	if len(set(feature_widths)) > 1:
+		for f, slot in enumerate(feature_slots):
+			if largest[f] > feature_capacity(feature_widths[slot], feature_widths):
+				return None
+	return feature_slots
+
+def tree_fits(tree, manifest):
+	# True if the tree can be installed on the data plane described by the manifest, without printing
+	alu_config = manifest['muxed_alu_config']
+	if len(set(tree.feature[tree.feature != -1].tolist())) > manifest['features']:
+		return False
+
+	feature_widths = feature_widths_or_default(manifest['features'], manifest.get('feature_widths'))
+	feature_slots = None
+	if len(set(feature_widths)) > 1:
+		feature_slots = assign_feature_slots(tree, feature_widths)
+		if feature_slots is None:
+			return False
+
+	subtree_layer_limits = leo_model(alu_config, False, False)[:-1]
+	sub_groups = sub_tree_splitter(tree, alu_config)
+	layers = assign_rule_to_layers(tree, sub_groups, subtree_layer_limits, verbose=False)
+	if layers is None:
+		return False
+
+	rules = generate_rules(tree, layers, alu_config, manifest['mem_type'] == 'sram', manifest['transient'],
+		sign_bit=alu_sign_bit(feature_widths), feature_slots=feature_slots)
+	return check_rules_against_manifest(rules, manifest, verbose=False)
+
+def write_feature_mapping(tree, filename, quantizations=None, feature_slots=None, feature_widths=None):
+	by_name = {}
+	if quantizations is not None:
+		by_name = {q['name'] : q for q in quantizations}
+	if feature_slots is None:
+		feature_slots = list(range(len(tree.feature_names)))
+
+	f = open(filename, 'w')
+	for i, name in sorted(zip(feature_slots, tree.feature_names)):
+		quantization = by_name.get(name)
+		if feature_widths is not None:
+			# Narrow features saturate instead of wrapping around
+			saturation = feature_capacity(feature_widths[i], feature_widths) + 1
+			if quantization is None:
+				quantization = clip_quantization(name, DEFAULT_FEATURE_WIDTH)
+			if quantization['max'] > saturation:
+				quantization = dict(quantization, max=saturation)
+
+		if quantization is not None:
+			f.writelines(feature_transform(i + 1, quantization))
+		else:
+			f.write(feature_mapping_t.substitute(feature=i + 1, name=name))
+	f.close()
 
-	alu_config = [k] * num_layers
-	subtree_layer_limits = leo_resource_model.leo_model(alu_config, False, False)
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program generates the Leo SRAM/TCAM control plane code for a trained decision tree.')
+
+	grouped_args = parser.add_mutually_exclusive_group(required=True)
+	grouped_args.add_argument('--sram', action='store_true', help='Use SRAM memory.')
+	grouped_args.add_argument('--tcam', action='store_true', help='Use TCAM memory.')
+
+	parser.add_argument('--input_filename', type=str, required=True, help='The decision tree exported by scikit-learn\'s export_text(...).')
+	parser.add_argument('--output_filename', type=str, required=True, help='The output file name containing generated control plane code.')
+	parser.add_argument('--sub_tree', type=int, help='Depth of sub-tree (2 = 3 nodes in a layer, 3 = 7 nodes in a layer, etc.)')
+	parser.add_argument('--depth', type=int, help='The depth of the tree class (Excluding leaf layer).')
+	parser.add_argument('--muxed_alu_config', type=args_type_for_number_list, help='A comma-separated list of the number of Muxed ALUs in each layer (E.g.: 7,3,3,1). Replaces --sub_tree and --depth.')
+	parser.add_argument('--transient', action='store_true', help='The data plane was generated with support for transient state during runtime tree updates.')
+	parser.add_argument('--feature_widths', type=args_type_for_number_list, help='The comma-separated feature widths the data plane was generated with (Default: the manifest, otherwise the installed tree of --state, otherwise 16 bits for every feature).')
+	parser.add_argument('--quantization', type=str, help='Feature quantization learned during training. The thresholds are mapped to the quantized features and the feature mapping holds the matching transform.')
+	parser.add_argument('--manifest', type=str, help='The manifest written next to the generated P4 program. Rule counts are checked against its table sizes, and it replaces --sub_tree and --depth.')
+	parser.add_argument('--state', type=str, help='The installed tree, as written by the previous run. If the file exists, only the entries that change are updated (with --transient, the new tree is staged under the inactive tree_id). It is then rewritten for the new tree.')
+	args = parser.parse_args()
+
+	manifest = None
+	if args.manifest is not None:
+		manifest = load_manifest(args.manifest)
+		if manifest['mem_type'] != ('sram' if args.sram else 'tcam') or manifest['transient'] != args.transient:
+			print('Error: The data plane was generated for', manifest['mem_type'].upper(), 'with transient =', manifest['transient'])
+			return
+
+	if args.muxed_alu_config is not None:
+		alu_config = args.muxed_alu_config
+	elif args.sub_tree is not None and args.depth is not None:
+		alu_config = uniform_alu_config(args.sub_tree, args.depth)
+	elif manifest is not None:
+		alu_config = manifest['muxed_alu_config']
+	else:
+		parser.error('either --muxed_alu_config, --manifest or both --sub_tree and --depth are required')
+
+	subtree_layer_limits = leo_model(alu_config, False, False)
 	subtree_layer_limits = subtree_layer_limits[:-1]
 
-	tree = build_tree_from_file(filename)
-	sub_groups = sub_tree_splitter(tree.root, k)
-	layers = assign_rule_to_layers(sub_groups, subtree_layer_limits)
-	generate_runtime_code(layers, k)
+	tree = build_tree_from_file(args.input_filename)
+	state = None
+	if args.state is not None and os.path.exists(args.state):
+		state = load_state(args.state)
+
+	# The header of an installed data plane is not resized for the features of a new tree
+	if args.feature_widths is not None:
+		feature_widths = args.feature_widths
+	elif manifest is not None and 'feature_widths' in manifest:
+		feature_widths = manifest['feature_widths']
+	elif state is not None:
+		feature_widths = state['feature_widths']
+	else:
+		feature_widths = feature_widths_or_default(len(tree.feature_names), None)
+	feature_width = max(feature_widths)
+
+	mem_type = 'sram' if args.sram else 'tcam'
+	if state is not None:
+		if state['mem_type'] != mem_type or state['muxed_alu_config'] != list(alu_config) or state['transient'] != args.transient or state['feature_widths'] != list(feature_widths):
+			print('Error: The installed tree is for another data plane, remove', args.state, 'to install the tree from scratch')
+			return
+
+	quantizations = None
+	if args.quantization is not None:
+		quantization = load_quantization(args.quantization)
+		if quantization['feature_width'] > feature_width:
+			print('Error: The quantization is for', quantization['feature_width'], 'bit features, the data plane uses', feature_width)
+			return
+		quantizations = quantization['features']
+		quantize_tree(tree, quantizations)
+
+	feature_slots = None
+	if state is not None:
+		feature_slots = pin_feature_slots(tree, feature_widths, state['tree'].feature_names, state['feature_slots'], args.transient)
+		if feature_slots is None:
+			print('Error: The new features do not fit the header features left free by the installed tree', feature_widths, ', remove', args.state, 'to install the tree from scratch')
+			return
+	elif len(set(feature_widths)) > 1:
+		feature_slots = assign_feature_slots(tree, feature_widths)
+		if feature_slots is None:
+			print('Error: The thresholds of the tree features do not fit the feature widths', feature_widths, ', see --quantization')
+			return
+	if len(set(feature_widths)) == 1 and np.any(tree.constraint[tree.feature != -1] > max_feature_value(feature_width)):
+		print('Warning: Some thresholds do not fit', feature_width, 'bit features and are clipped, see --quantization')
+
+	sub_groups = sub_tree_splitter(tree, alu_config)
+	layers = assign_rule_to_layers(tree, sub_groups, subtree_layer_limits)
+	if layers is None:
+		return
+
+	sign_bit = alu_sign_bit(feature_widths)
+
+	tree_id = 0
+	group_ids = None
+	if state is not None:
+		if args.transient:
+			tree_id = 1 - state['tree_id']
+		old_signatures = group_signatures(state['tree'], state['layers'], sign_bit, state['feature_slots'])
+		group_ids = assign_group_ids(state['layers'], state['group_ids'], old_signatures,
+			layers, group_signatures(tree, layers, sign_bit, feature_slots), args.transient)
+
+	rules = generate_rules(tree, layers, alu_config, args.sram, args.transient, tree_id, sign_bit, feature_slots, group_ids)
+	if manifest is not None and not check_rules_against_manifest(rules, manifest):
+		return
+
+	if state is None:
+		code = generate_runtime_code(rules, alu_config, args.transient)
+	else:
+		old_rules = generate_rules(state['tree'], state['layers'], alu_config, args.sram, args.transient, state['tree_id'], sign_bit,
+			state['feature_slots'], state['group_ids'])
+		adds, mods, deletes = diff_rules(old_rules, rules)
+		code = generate_update_code(adds, mods, deletes, args.transient, tree_id)
+		print('Update:', len(adds), 'added,', len(mods), 'modified,', len(deletes), 'deleted,', len(rules) - len(adds) - len(mods), 'unchanged')
+		if args.transient and len(mods) > 0:
+			print('Warning:', len(mods), 'entries are shared by both trees and only change after the switch to tree_id', tree_id)
+
+	f = open(args.output_filename, 'w')
+	f.writelines(code)
+	f.close()
+
+	write_feature_mapping(tree, os.path.join(os.path.dirname(args.output_filename), 'feature_mapping.txt'), quantizations, feature_slots,
+		feature_widths if len(set(feature_widths)) > 1 else None)
+	if args.state is not None:
+		if group_ids is None:
+			group_ids = [list(range(1, len(groups) + 1)) for layer, groups in layers]
+		write_state(args.state, tree, layers, group_ids, tree_id, feature_slots, feature_widths, mem_type, alu_config, args.transient)
+	print('Generated', len(rules), 'table entries')
 
 if __name__ == '__main__':
-	main()
\ No newline at end of file
+	main()
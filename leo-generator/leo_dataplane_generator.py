@@ -1,8 +1,10 @@
-from leo_sram import leo_sram_gen
-from leo_tcam import leo_tcam_gen
+from leo_sram import leo_sram_stream
+from leo_tcam import leo_tcam_stream
+from leo_resource_model import uniform_alu_config, args_type_for_number_list
+from leo_cache import *
+from leo_templates import DEFAULT_FEATURE_WIDTH
 
 import argparse
-import math
 
 def main():
 	parser = argparse.ArgumentParser(
@@ -13,24 +15,54 @@ def main():
 	grouped_args.add_argument('--tcam', action='store_true', help='Use TCAM memory.')
 	
 	parser.add_argument('--filename', type=str, required=True, help='The output file name containing generated P4 code.')
-	parser.add_argument('--sub_tree', type=int, required=True, help='Depth of sub-tree (2 = 3 nodes in a layer, 3 = 7 nodes in a layer, etc.)')
-	parser.add_argument('--depth', type=int, required=True, help='The depth of the tree class (Excluding leaf layer).')
+	parser.add_argument('--sub_tree', type=int, help='Depth of sub-tree (2 = 3 nodes in a layer, 3 = 7 nodes in a layer, etc.)')
+	parser.add_argument('--depth', type=int, help='The depth of the tree class (Excluding leaf layer).')
+	parser.add_argument('--muxed_alu_config', type=args_type_for_number_list, help='A comma-separated list of the number of Muxed ALUs in each layer (E.g.: 7,3,3,1). Replaces --sub_tree and --depth.')
 	parser.add_argument('--features', type=int, required=True, help='The number of features supported in the tree class.')
+	parser.add_argument('--feature_widths', type=args_type_for_number_list, help='A comma-separated list of the width in bits of every feature, at most 16 (E.g.: 16,16,8,8). Default: 16 bits for every feature.')
 	parser.add_argument('--leaf_limit', type=int, default=0, help='If the tree class has a limit on the number of leaves (Exclude this argument if no limit).')
 	parser.add_argument('--transient', action='store_true', help='Enable support for transient state during runtime tree updates.')
+	parser.add_argument('--cache_dir', type=str, default=DEFAULT_CACHE_DIR, help='Directory of previously generated programs (Default: ~/.cache/leo).')
+	parser.add_argument('--cache_size', type=int, default=DEFAULT_CACHE_SIZE, help='Maximum size of the program cache in bytes, least recently used programs are evicted first.')
+	parser.add_argument('--no_cache', action='store_true', help='Always regenerate the program and leave the cache untouched.')
 	args = parser.parse_args()
 
-	layers = int(math.ceil(args.depth / args.sub_tree))
+	if args.muxed_alu_config is not None:
+		alu_config = args.muxed_alu_config
+	elif args.sub_tree is not None and args.depth is not None:
+		alu_config = uniform_alu_config(args.sub_tree, args.depth)
+	else:
+		parser.error('either --muxed_alu_config or both --sub_tree and --depth are required')
+
+	if args.feature_widths is not None:
+		if len(args.feature_widths) != args.features:
+			parser.error('--feature_widths needs one width for each of the ' + str(args.features) + ' features')
+		if min(args.feature_widths) < 1 or max(args.feature_widths) > DEFAULT_FEATURE_WIDTH:
+			parser.error('feature widths must be between 1 and ' + str(DEFAULT_FEATURE_WIDTH) + ' bits')
+
+	manifest = leo_manifest(args.sram, alu_config, args.features, args.leaf_limit, args.transient, args.feature_widths)
+	write_manifest(manifest, manifest_filename(args.filename))
+
+	if not args.no_cache:
+		cache = ProgramCache(args.cache_dir, args.cache_size)
+		key = cache.key(tree_class_params(args.sram, alu_config, args.features, args.leaf_limit, args.transient, args.feature_widths))
+		if cache.get(key, args.filename) is not None:
+			print('Copied cached program', key)
+			return
 
 	if args.tcam:
-		code = leo_tcam_gen(args.sub_tree, layers, args.features, args.leaf_limit, args.transient)
+		code = leo_tcam_stream(alu_config, args.features, args.leaf_limit, args.transient, args.feature_widths)
 	elif args.sram:
-		code = leo_sram_gen(args.sub_tree, layers, args.features, args.transient)
+		code = leo_sram_stream(alu_config, args.features, args.transient, args.feature_widths)
 
+	# Fragments are written as they are rendered instead of building the whole program first
 	f = open(args.filename, 'w')
 	f.writelines(code)
 	f.close()
 
+	if not args.no_cache:
+		cache.put(key, args.filename, manifest)
+
 
 if __name__ == '__main__':
 	main()
\ No newline at end of file
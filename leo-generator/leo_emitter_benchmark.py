@@ -0,0 +1,131 @@
+from leo_sram import leo_sram_gen, leo_sram_stream, keys_gen as sram_keys_gen
+from leo_tcam import leo_tcam_gen, leo_tcam_stream, keys_gen as tcam_keys_gen
+from leo_templates import mux_key
+from leo_resource_model import uniform_alu_config, args_type_for_number_list
+
+import argparse
+import filecmp
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+GENERATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_MODULES = ['leo_templates', 'leo_resource_model', 'leo_sram', 'leo_tcam']
+
+def baseline_revision():
+	# The parent of the commit that introduced the streamed emitters
+	log = subprocess.check_output(['git', 'log', '--format=%H', '--reverse', '-S', 'leo_sram_stream', '--', 'leo_sram.py'], cwd=GENERATOR_DIR, text=True).split()
+	if len(log) == 0:
+		raise ValueError('No commit introduces leo_sram_stream, pass --baseline_rev')
+	return log[0] + '^'
+
+def load_baseline(rev, tmp):
+	# Loads the emitters of rev from git, so the previous code is never copied into the tree. While they
+	# load, their own templates and resource model stand in for the current modules of the same name.
+	saved = {name : sys.modules.get(name) for name in BASELINE_MODULES}
+	modules = {}
+	try:
+		for name in BASELINE_MODULES:
+			path = os.path.join(tmp, 'baseline_' + name + '.py')
+			f = open(path, 'wb')
+			f.write(subprocess.check_output(['git', 'show', rev + ':./' + name + '.py'], cwd=GENERATOR_DIR))
+			f.close()
+			spec = importlib.util.spec_from_file_location('baseline_' + name, path)
+			modules[name] = importlib.util.module_from_spec(spec)
+			sys.modules[name] = modules[name]
+			spec.loader.exec_module(modules[name])
+	finally:
+		for name, module in saved.items():
+			if module is None:
+				sys.modules.pop(name, None)
+			else:
+				sys.modules[name] = module
+	return modules['leo_sram'].leo_sram_gen, modules['leo_tcam'].leo_tcam_gen
+
+def write_materialized(filename, code):
+	# Render the whole program into a list, then write it
+	code = list(code)
+	f = open(filename, 'w')
+	f.writelines(code)
+	f.close()
+
+def write_streamed(filename, code):
+	f = open(filename, 'w')
+	f.writelines(code)
+	f.close()
+
+def measure(write, filename, make_code, repeat):
+	times = []
+	for i in range(repeat):
+		# Start every run from a cold fragment cache
+		mux_key.cache_clear()
+		sram_keys_gen.cache_clear()
+		tcam_keys_gen.cache_clear()
+
+		start = time.perf_counter()
+		write(filename, make_code())
+		times.append(time.perf_counter() - start)
+
+	mux_key.cache_clear()
+	sram_keys_gen.cache_clear()
+	tcam_keys_gen.cache_clear()
+	tracemalloc.start()
+	write(filename, make_code())
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	return min(times), peak, os.path.getsize(filename)
+
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program compares writing the generated P4 program as it is rendered against the previous string-concatenation emitter and against rendering it to a list first.')
+
+	parser.add_argument('--sub_tree', type=int, default=3, help='Depth of sub-tree (2 = 3 nodes in a layer, 3 = 7 nodes in a layer, etc.)')
+	parser.add_argument('--depth', type=int, default=20, help='The depth of the tree class (Excluding leaf layer).')
+	parser.add_argument('--muxed_alu_config', type=args_type_for_number_list, help='A comma-separated list of the number of Muxed ALUs in each layer (E.g.: 7,3,3,1). Replaces --sub_tree and --depth.')
+	parser.add_argument('--features', type=int, default=32, help='The number of features supported in the tree class.')
+	parser.add_argument('--leaf_limit', type=int, default=0, help='If the tree class has a limit on the number of leaves (Exclude this argument if no limit).')
+	parser.add_argument('--transient', action='store_true', help='Enable support for transient state during runtime tree updates.')
+	parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs per emitter (the fastest is reported).')
+	parser.add_argument('--baseline_rev', type=str, help='Git revision of the previous emitters (Default: the parent of the commit that introduced streaming).')
+	args = parser.parse_args()
+
+	if args.muxed_alu_config is not None:
+		alu_config = args.muxed_alu_config
+	else:
+		alu_config = uniform_alu_config(args.sub_tree, args.depth)
+
+	print('Muxed ALU config:', ','.join(str(a) for a in alu_config), '| Features:', args.features)
+	with tempfile.TemporaryDirectory() as tmp:
+		rev = args.baseline_rev if args.baseline_rev is not None else baseline_revision()
+		baseline_sram_gen, baseline_tcam_gen = load_baseline(rev, tmp)
+		print('Baseline:', subprocess.check_output(['git', 'log', '-1', '--format=%h %s', rev], cwd=GENERATOR_DIR, text=True).strip())
+
+		# The previous emitters concatenate strings and return the whole program as a list
+		emitters = [
+			('SRAM', 'baseline', write_materialized, lambda: baseline_sram_gen(alu_config, args.features, args.transient)),
+			('SRAM', 'list', write_materialized, lambda: leo_sram_gen(alu_config, args.features, args.transient)),
+			('SRAM', 'stream', write_streamed, lambda: leo_sram_stream(alu_config, args.features, args.transient)),
+			('TCAM', 'baseline', write_materialized, lambda: baseline_tcam_gen(alu_config, args.features, args.leaf_limit, args.transient)),
+			('TCAM', 'list', write_materialized, lambda: leo_tcam_gen(alu_config, args.features, args.leaf_limit, args.transient)),
+			('TCAM', 'stream', write_streamed, lambda: leo_tcam_stream(alu_config, args.features, args.leaf_limit, args.transient)),
+		]
+
+		print('{:>6}  {:>8}  {:>10}  {:>16}  {:>12}'.format('Memory', 'Emitter', 'Time (ms)', 'Peak Memory (KB)', 'Output (KB)'))
+		for memory, name, write, make_code in emitters:
+			filename = os.path.join(tmp, memory + '_' + name + '.p4')
+			elapsed, peak, size = measure(write, filename, make_code, args.repeat)
+			print('{:>6}  {:>8}  {:>10.1f}  {:>16.0f}  {:>12.0f}'.format(memory, name, elapsed * 1000, peak / 1024, size / 1024))
+
+		# Every emitter must write the program of the baseline, byte for byte
+		for memory, name, write, make_code in emitters:
+			reference = os.path.join(tmp, memory + '_baseline.p4')
+			assert filecmp.cmp(reference, os.path.join(tmp, memory + '_' + name + '.p4'), shallow=False), memory + ' ' + name + ' differs from the baseline output'
+		print('Output identical to the baseline for every emitter')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,143 @@
+import json
+import numpy as np
+from leo_templates import feature_mapping_t, feature_segment_t, feature_clip_t
+
+# Features and constraints are added in a FEATURE_WIDTH-bit ALU and only the top bit is kept,
+# so both have to stay below it
+def max_feature_value(width):
+	return (1 << (width - 1)) - 1
+
+# A quantization maps a raw feature x >= 0 to min(base + (x >> shift), max) on the segment
+# [lower, next lower) holding x. Every mapping below is non-decreasing, so 'x <= t' on the raw
+# feature becomes 'q(x) <= q(t)' on the quantized one.
+def clip_quantization(name, width):
+	return {'name' : name, 'kind' : 'clip', 'lower' : [0], 'base' : [0], 'shift' : [0], 'max' : max_feature_value(width)}
+
+def shift_quantization(name, width, raw_max):
+	max_value = max_feature_value(width)
+	shift = 0
+	while (raw_max >> shift) > max_value:
+		shift += 1
+	return {'name' : name, 'kind' : 'shift', 'lower' : [0], 'base' : [0], 'shift' : [shift], 'max' : max_value}
+
+def log_quantization(name, width, raw_max):
+	# Log-linear buckets: the exponent of x and its top mantissa bits, as many as still fit
+	max_value = max_feature_value(width)
+	exponent = max(int(raw_max).bit_length() - 1, 0)
+	for mantissa in range(exponent, -1, -1):
+		if ((exponent - mantissa) << mantissa) + (int(raw_max) >> (exponent - mantissa)) <= max_value:
+			break
+
+	lower = [0]
+	base = [0]
+	shift = [0]
+	for e in range(mantissa + 1, exponent + 1):
+		lower.append(1 << e)
+		base.append((e - mantissa) << mantissa)
+		shift.append(e - mantissa)
+	return {'name' : name, 'kind' : 'log', 'mantissa' : mantissa, 'lower' : lower, 'base' : base, 'shift' : shift, 'max' : max_value}
+
+def quantize_values(values, quantization):
+	values = np.maximum(np.floor(np.asarray(values, dtype=np.float64)), 0).astype(np.int64)
+	segment = np.searchsorted(np.array(quantization['lower'], dtype=np.int64), values, side='right') - 1
+	shift = np.array(quantization['shift'], dtype=np.int64)[segment]
+	quantized = np.array(quantization['base'], dtype=np.int64)[segment] + np.right_shift(values, shift)
+	return np.minimum(quantized, quantization['max'])
+
+def quantize_columns(X, feature_names, quantizations):
+	# X has one column per entry of feature_names, features without a quantization are kept
+	by_name = {q['name'] : q for q in quantizations}
+	X = np.array(X, dtype=np.float64)
+	columns = []
+	for i, name in enumerate(feature_names):
+		if name in by_name:
+			columns.append(quantize_values(X[:, i], by_name[name]))
+		else:
+			columns.append(np.floor(X[:, i]).astype(np.int64))
+	return np.stack(columns, axis=1) if columns else np.zeros((len(X), 0), dtype=np.int64)
+
+def quantized_constraints(tree, quantizations):
+	# The constraints still read 'go left if feature <= constraint', on the quantized features
+	by_name = {q['name'] : q for q in quantizations}
+	internal = np.flatnonzero(tree.feature != -1)
+	constraint = tree.constraint.copy()
+	for f, name in enumerate(tree.feature_names):
+		if name not in by_name:
+			continue
+		nodes = internal[tree.feature[internal] == f]
+		constraint[nodes] = np.where(tree.constraint[nodes] < 0, -1, quantize_values(tree.constraint[nodes], by_name[name]))
+	return constraint
+
+def quantize_tree(tree, quantizations):
+	tree.constraint = quantized_constraints(tree, quantizations)
+	return tree
+
+def fit_quantization(tree, X, width, kinds=('clip', 'shift', 'log')):
+	# Per feature, keeps the mapping under which the quantized tree classifies the training rows
+	# most like the original tree; features that already fit FEATURE_WIDTH are only clipped
+	X = np.array(X, dtype=np.float64)
+	reference = tree.predict(np.floor(X).astype(np.int64))
+	constraint = tree.constraint
+	quantizations = []
+	for f, name in enumerate(tree.feature_names):
+		raw_max = int(max(np.max(X[:, f]), 0)) if len(X) > 0 else 0
+		candidates = [clip_quantization(name, width)]
+		if raw_max > max_feature_value(width):
+			candidates = []
+			if 'clip' in kinds:
+				candidates.append(clip_quantization(name, width))
+			if 'shift' in kinds:
+				candidates.append(shift_quantization(name, width, raw_max))
+				# Clipping the outliers keeps more resolution for the bulk of the values
+				candidates.append(shift_quantization(name, width, int(np.quantile(X[:, f], 0.999))))
+			if 'log' in kinds:
+				candidates.append(log_quantization(name, width, raw_max))
+
+		best = None
+		for candidate in candidates:
+			tree.constraint = quantized_constraints(tree, [candidate])
+			agreement = np.mean(tree.predict(quantize_columns(X, tree.feature_names, [candidate])) == reference)
+			tree.constraint = constraint
+			if best is None or agreement > best[0]:
+				best = (agreement, candidate)
+		quantizations.append(best[1])
+
+	return quantizations
+
+def write_quantization(quantizations, width, filename):
+	f = open(filename, 'w')
+	json.dump({'feature_width' : width, 'features' : quantizations}, f, indent=4)
+	f.close()
+
+def load_quantization(filename):
+	f = open(filename)
+	quantization = json.load(f)
+	f.close()
+	return quantization
+
+def saturation_limit(quantization):
+	lower = quantization['lower']
+	for i in range(len(lower)):
+		limit = max(lower[i], (quantization['max'] - quantization['base'][i] + 1) << quantization['shift'][i])
+		if i + 1 == len(lower) or limit < lower[i + 1]:
+			return limit
+
+def feature_transform(feature, quantization):
+	# The range match that computes hdr.leo.feature_<feature> from the raw feature
+	name = quantization['name']
+	lower = quantization['lower']
+	if quantization['kind'] == 'clip' and len(lower) == 1:
+		code = [feature_mapping_t.substitute(feature=feature, name=name)]
+	else:
+		code = []
+		for i in range(len(lower)):
+			if i + 1 < len(lower):
+				condition = str(lower[i]) + ' <= ' + name + ' <= ' + str(lower[i + 1] - 1)
+			else:
+				condition = name + ' >= ' + str(lower[i])
+			code.append(feature_segment_t.substitute(feature=feature, name=name, base=quantization['base'][i],
+				shift=quantization['shift'][i], condition=condition))
+
+	# Values from the first one that would map past max saturate at max
+	code.append(feature_clip_t.substitute(feature=feature, name=name, limit=saturation_limit(quantization), max=quantization['max']))
+	return code
@@ -0,0 +1,143 @@
+import bisect
+import itertools
+import numpy as np
+
+def range_to_prefixes(lower, upper, width):
+	full_mask = (1 << width) - 1
+	prefixes = []
+	while lower <= upper:
+		# Largest aligned block that starts at lower and stays inside the range
+		size = (lower & -lower) if lower != 0 else (1 << width)
+		while lower + size - 1 > upper:
+			size >>= 1
+
+		prefixes.append((lower, full_mask & ~(size - 1)))
+		lower += size
+
+	return prefixes
+
+def ranges_to_prefixes(lowers, uppers, width):
+	lower = np.array(lowers, dtype=np.int64)
+	upper = np.array(uppers, dtype=np.int64)
+	ids = np.arange(len(lower))
+	full_mask = (1 << width) - 1
+
+	range_ids = []
+	values = []
+	masks = []
+	active = lower <= upper
+	# Every range needs at most 2 * width blocks, all ranges advance together
+	while active.any():
+		ids = ids[active]
+		lower = lower[active]
+		upper = upper[active]
+
+		low_bit = np.where(lower == 0, 1 << width, lower & -lower)
+		span = upper - lower + 1
+		fit = np.left_shift(1, np.floor(np.log2(span)).astype(np.int64))
+		fit = np.where(fit * 2 <= span, fit * 2, fit)
+		fit = np.where(fit > span, fit // 2, fit)
+		size = np.minimum(low_bit, fit)
+
+		range_ids.append(ids)
+		values.append(lower)
+		masks.append(full_mask & ~(size - 1))
+
+		lower = lower + size
+		active = lower <= upper
+
+	if len(range_ids) == 0:
+		return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+	range_ids = np.concatenate(range_ids)
+	order = np.argsort(range_ids, kind='stable')
+	return range_ids[order], np.concatenate(values)[order], np.concatenate(masks)[order]
+
+def prefix_to_str(value, mask, width):
+	bits = ''
+	for i in range(width - 1, -1, -1):
+		if (mask >> i) & 1:
+			bits += str((value >> i) & 1)
+		else:
+			bits += '*'
+	return bits
+
+def min_ternary_cover(lowers, uppers, width, labels=None):
+	# Optimal prioritized prefix cover of consecutive ranges (first match wins).
+	# Values above the last range never occur and may match anything.
+	if labels is None:
+		labels = list(range(len(lowers)))
+	lowers = list(lowers)
+	if len(lowers) == 0 or lowers[0] != 0:
+		raise ValueError('The ranges must start at 0, got ' + str(lowers[:1]))
+	for i in range(1, len(lowers)):
+		if lowers[i] != uppers[i - 1] + 1:
+			raise ValueError('The ranges must be consecutive, range ' + str(i) + ' starts at ' + str(lowers[i]) + ' after ' + str(uppers[i - 1]))
+	upper_lim = uppers[-1]
+	full_mask = (1 << width) - 1
+	memo = {}
+
+	def uniform_label(lo, size):
+		hi = lo + size - 1
+		if lo > upper_lim:
+			return True, None
+		i = bisect.bisect_right(lowers, lo) - 1
+		if min(hi, upper_lim) <= uppers[i]:
+			return True, labels[i]
+		return False, None
+
+	# Cost of a node given the label inherited from an enclosing entry:
+	# a dict for labels present below it and one cost shared by every other label
+	def solve(lo, size):
+		uniform, label = uniform_label(lo, size)
+		if uniform:
+			if label is None:
+				return {}, 0
+			return {label: 0}, 1
+
+		half = size // 2
+		left_costs, left_other = solve(lo, half)
+		right_costs, right_other = solve(lo + half, half)
+
+		totals = {}
+		for label in itertools.chain(left_costs, right_costs):
+			if label not in totals:
+				totals[label] = left_costs.get(label, left_other) + right_costs.get(label, right_other)
+
+		best_label = min(totals, key=totals.get)
+		best_new = 1 + totals[best_label]
+		costs = {label: min(cost, best_new) for label, cost in totals.items()}
+		other = min(left_other + right_other, best_new)
+		memo[lo, size] = (costs, other, best_label, best_new)
+		return costs, other
+
+	def cost_of(lo, size, inherited):
+		if (lo, size) not in memo:
+			uniform, label = uniform_label(lo, size)
+			return 0 if label is None or label == inherited else 1
+		costs, other = memo[lo, size][0:2]
+		return costs.get(inherited, other)
+
+	entries = []
+	def emit(lo, size, inherited):
+		mask = full_mask & ~(size - 1)
+		if (lo, size) not in memo:
+			uniform, label = uniform_label(lo, size)
+			if label is not None and label != inherited:
+				entries.append((lo, mask, label))
+			return
+
+		half = size // 2
+		best_label, best_new = memo[lo, size][2:4]
+		if best_new < cost_of(lo, half, inherited) + cost_of(lo + half, half, inherited):
+			# Children first, so they take priority over this node's entry
+			emit(lo, half, best_label)
+			emit(lo + half, half, best_label)
+			entries.append((lo, mask, best_label))
+		else:
+			emit(lo, half, inherited)
+			emit(lo + half, half, inherited)
+
+	solve(0, 1 << width)
+	emit(0, 1 << width, None)
+	return entries
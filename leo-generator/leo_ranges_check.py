@@ -0,0 +1,70 @@
+from leo_ranges import range_to_prefixes, ranges_to_prefixes, min_ternary_cover
+
+import argparse
+import numpy as np
+
+def random_ranges(rng, width):
+	# Consecutive ranges from 0 up to a random limit of the domain, with repeated labels
+	limit = rng.randint(0, 1 << width)
+	cuts = np.unique(rng.randint(1, limit + 1, rng.randint(0, min(limit, 12) + 1))) if limit > 0 else np.zeros(0, dtype=np.int64)
+	lowers = [0] + cuts.tolist()
+	uppers = [c - 1 for c in cuts.tolist()] + [limit]
+	labels = rng.randint(0, rng.randint(1, len(lowers) + 1), len(lowers)).tolist()
+	return lowers, uppers, labels
+
+def first_match(entries, value):
+	for entry_value, mask, label in entries:
+		if value & mask == entry_value & mask:
+			return label
+	return None
+
+def check_prefixes(lowers, uppers, width):
+	range_ids, values, masks = ranges_to_prefixes(lowers, uppers, width)
+	for i, (lower, upper) in enumerate(zip(lowers, uppers)):
+		expected = range_to_prefixes(lower, upper, width)
+		got = list(zip(values[range_ids == i].tolist(), masks[range_ids == i].tolist()))
+		assert got == expected, 'ranges_to_prefixes differs from range_to_prefixes on ' + str((lower, upper))
+	return len(range_ids)
+
+def check_cover(lowers, uppers, labels, width, num_prefixes):
+	entries = min_ternary_cover(lowers, uppers, width, labels)
+	for lower, upper, label in zip(lowers, uppers, labels):
+		for value in range(lower, upper + 1):
+			assert first_match(entries, value) == label, 'value ' + str(value) + ' of ' + str((lower, upper)) + ' does not match ' + str(label)
+	# One entry per prefix of every range is always a valid cover
+	assert len(entries) <= num_prefixes, 'the cover is larger than the prefix expansion'
+
+def check_rejected(lowers, uppers, width):
+	try:
+		min_ternary_cover(lowers, uppers, width)
+	except ValueError:
+		return
+	raise AssertionError('ranges ' + str(list(zip(lowers, uppers))) + ' were not rejected')
+
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program checks the TCAM range expansion and the prioritized ternary cover on random ranges.')
+
+	parser.add_argument('--cases', type=int, default=2000, help='Number of random range sets (Default: 2000).')
+	parser.add_argument('--max_width', type=int, default=8, help='Largest feature width (Default: 8).')
+	parser.add_argument('--seed', type=int, default=0, help='Seed of the random ranges (Default: 0).')
+	args = parser.parse_args()
+
+	rng = np.random.RandomState(args.seed)
+	for i in range(args.cases):
+		width = rng.randint(1, args.max_width + 1)
+		lowers, uppers, labels = random_ranges(rng, width)
+		num_prefixes = check_prefixes(lowers, uppers, width)
+		check_cover(lowers, uppers, labels, width, num_prefixes)
+
+		# Ranges that leave values uncovered below or between them are rejected
+		if uppers[-1] > 0:
+			start = rng.randint(1, uppers[-1] + 1)
+			check_rejected([start], [uppers[-1]], width)
+		if len(lowers) > 2:
+			check_rejected(lowers[:1] + lowers[2:], uppers[:1] + uppers[2:], width)
+
+	print('Checked', args.cases, 'random range sets')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,106 @@
+import argparse
+import functools
+import math
+import numpy as np
+
+@functools.lru_cache(maxsize=None)
+def leo_model_cached(alu_config, is_sram, transient, leaf_limit=0):
+	num_alu_layers = len(alu_config)
+	single_table_sizes = []
+	layer_sizes = []
+
+	curr_layer_result_combos = 1
+	prev_layer_tcam = 1
+	curr_layer_tcam = 1
+
+	for l in range(1, num_alu_layers + 2):
+		if l == num_alu_layers + 1:
+			num_mux_next_layer = 1
+		else:
+			num_mux_next_layer = alu_config[l - 1]
+
+		if l > 1:
+			curr_layer_tcam = alu_config[l - 2] + 1
+			if is_sram:
+				curr_layer_result_combos = 2 ** alu_config[l - 2]
+			else:
+				curr_layer_result_combos = curr_layer_tcam
+
+		single_table_size = curr_layer_result_combos * prev_layer_tcam
+		# A TCAM table never needs more entries than the tree has leaves
+		if not is_sram and leaf_limit != 0:
+			single_table_size = min(single_table_size, leaf_limit)
+		layer_size = single_table_size * num_mux_next_layer
+		if transient:
+			layer_size = layer_size * 2
+			single_table_size = single_table_size * 2
+
+		single_table_sizes.append(single_table_size)
+		layer_sizes.append(layer_size)
+
+		prev_layer_tcam = curr_layer_tcam * prev_layer_tcam
+
+	return tuple(single_table_sizes), tuple(layer_sizes)
+
+def leo_model(alu_config, is_sram, transient, log=False, leaf_limit=0):
+	single_table_sizes, layer_sizes = leo_model_cached(tuple(alu_config), is_sram, transient, leaf_limit)
+
+	if log:
+		print('{:>12}  {:>12}  {:>12}'.format('Layer #', 'Single Table Size', 'Total Layer Size'))
+		for l in range(len(single_table_sizes)):
+			print('{:>12}  {:>12}  {:>12}'.format(l + 1, single_table_sizes[l], layer_sizes[l]))
+		print('Total Size:', sum(layer_sizes))
+
+	return list(single_table_sizes)
+
+def leo_model_vec(alu_configs, is_sram, transient, leaf_limit=0):
+	# alu_configs holds one configuration per row, all with the same number of layers.
+	# Returns the single table sizes (one column per layer, leaf layer included) and total sizes.
+	alus = np.atleast_2d(np.asarray(alu_configs, dtype=np.int64))
+	num_configs, num_alu_layers = alus.shape
+
+	# Number of sub-trees that can reach layer l is the product of (ALUs + 1) of the layers before it
+	reachable = np.ones((num_configs, num_alu_layers + 1), dtype=np.int64)
+	reachable[:, 1:] = np.cumprod(alus + 1, axis=1)
+
+	if is_sram:
+		result_combos = np.left_shift(1, alus)
+	else:
+		result_combos = alus + 1
+
+	single_table_sizes = np.ones((num_configs, num_alu_layers + 1), dtype=np.int64)
+	single_table_sizes[:, 1:] = result_combos * reachable[:, :-1]
+	if not is_sram and leaf_limit != 0:
+		single_table_sizes = np.minimum(single_table_sizes, leaf_limit)
+
+	num_mux_next_layer = np.ones((num_configs, num_alu_layers + 1), dtype=np.int64)
+	num_mux_next_layer[:, :-1] = alus
+
+	if transient:
+		single_table_sizes = single_table_sizes * 2
+
+	total_sizes = (single_table_sizes * num_mux_next_layer).sum(axis=1)
+	return single_table_sizes, total_sizes
+
+# Rules in layer i of LEO
+@functools.lru_cache(maxsize=None)
+def R_i_cached(i, L, R, K):
+	if i == 1:
+		return 1
+	if L != 0:
+		return min(L, R[i-1] * (K[i] + 1))
+	else:
+		return R[i-1] * (K[i] + 1)
+
+def R_i(i, L, R, K):
+	return R_i_cached(i, L, tuple(R), tuple(K))
+
+def uniform_alu_config(sub_tree, depth):
+	num_layers = int(math.ceil(depth / sub_tree))
+	return [(2 ** sub_tree) - 1] * num_layers
+
+def args_type_for_number_list(arg):
+    try:
+        return [int(num) for num in arg.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('Invalid list of integers: "{}"'.format(arg))
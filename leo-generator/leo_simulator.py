@@ -0,0 +1,359 @@
+from leo_ctrlplane_generator import *
+
+import argparse
+import re
+import time
+import numpy as np
+
+FEATURE_MASK = 0xffff
+DENSE_CODE_LIMIT = 2 ** 22
+
+set_action_re = re.compile(r'set_(\d+)_(\d+)_feature(\d+)$')
+
+class ExactIndex:
+	# Maps key rows to entry ids. Every Leo key field is at most 16 bits wide,
+	# so each column is resolved with a dense lookup table instead of a search.
+	def __init__(self, key_rows, entry_ids):
+		self.luts = []
+		self.radix = []
+		codes = np.zeros(len(key_rows), dtype=np.int64)
+		mult = 1
+		for j in range(key_rows.shape[1]):
+			vals = np.unique(key_rows[:, j])
+			lut = np.full(FEATURE_MASK + 1, -1, dtype=np.int64)
+			lut[vals] = np.arange(len(vals))
+			codes += lut[key_rows[:, j]] * mult
+			self.luts.append(lut)
+			self.radix.append(mult)
+			mult *= len(vals)
+
+		# Duplicate keys keep the first installed entry
+		codes, first = np.unique(codes, return_index=True)
+		self.codes = codes
+		self.entry_ids = entry_ids[first]
+		self.dense = None
+		if mult <= DENSE_CODE_LIMIT:
+			self.dense = np.full(mult, -1, dtype=np.int64)
+			self.dense[codes] = self.entry_ids
+
+	def lookup(self, key_cols, n):
+		entry = np.full(n, -1, dtype=np.int64)
+		if len(self.luts) == 0:
+			entry[:] = self.entry_ids[0]
+			return entry
+
+		# The first column narrows the rows before the rest of the key is resolved
+		codes = self.luts[0][key_cols[0]]
+		rows = np.flatnonzero(codes >= 0)
+		codes = codes[rows]
+		valid = np.ones(len(rows), dtype=bool)
+		for lut, mult, col in zip(self.luts[1:], self.radix[1:], key_cols[1:]):
+			pos = lut[col[rows]]
+			valid &= pos >= 0
+			codes += pos * mult
+
+		if self.dense is not None:
+			entry[rows] = np.where(valid, self.dense[np.where(valid, codes, 0)], -1)
+			return entry
+
+		pos = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+		found = valid & (self.codes[pos] == codes)
+		entry[rows] = np.where(found, self.entry_ids[pos], -1)
+		return entry
+
+class LeoPipeline:
+	def __init__(self, is_sram, alu_config, num_features, leaf_limit, transient, rules, feature_widths=None):
+		self.is_sram = is_sram
+		self.alu_config = alu_config
+		self.num_alus = max(alu_config)
+		self.num_layers = len(alu_config)
+		self.num_features = num_features
+		self.transient = transient
+
+		self.feature_widths = feature_widths_or_default(num_features, feature_widths)
+		self.alu_mask = (1 << max(self.feature_widths)) - 1
+		self.sign_bit = alu_sign_bit(self.feature_widths)
+		# Mixed-width features saturate, as in the feature mapping written by the control plane generator
+		self.saturation = None
+		if len(set(self.feature_widths)) > 1:
+			self.saturation = np.array([feature_capacity(w, self.feature_widths) + 1 for w in self.feature_widths], dtype=np.int64)
+
+		by_layer = {}
+		for table, action, keys, params in rules:
+			layer_id = int(table.split('_')[1])
+			by_layer.setdefault(layer_id, {}).setdefault(table, []).append((action, keys, params))
+
+		table_sizes = leo_model(alu_config, is_sram, transient, leaf_limit=leaf_limit)
+		self.layers = {}
+		for layer_id, tables in by_layer.items():
+			for table, entries in tables.items():
+				size = table_sizes[layer_id - 1]
+				if len(entries) > size:
+					raise ValueError(table + ' has ' + str(len(entries)) + ' entries but its size is ' + str(size))
+			self.layers[layer_id] = self.compile_layer(tables)
+
+	def compile_layer(self, tables):
+		# All tables of a layer match on the same fields, so each distinct key is
+		# looked up once per layer and every table maps key ids to its own entries
+		key_ids = {}
+		for entries in tables.values():
+			for action, keys, params in entries:
+				if not self.is_sram:
+					keys = keys[:-1]
+				key_ids.setdefault(keys, len(key_ids))
+
+		keys = np.array(list(key_ids), dtype=np.int64)
+		ids = np.arange(len(key_ids))
+		patterns = []
+		if self.is_sram:
+			patterns.append((None, None, ExactIndex(keys, ids)))
+		else:
+			# Ternary keys are (value, mask) pairs
+			values = keys[:, 0::2]
+			masks = keys[:, 1::2]
+			mask_patterns, pattern_of = np.unique(masks, axis=0, return_inverse=True)
+			pattern_of = pattern_of.ravel()
+			for p, mask in enumerate(mask_patterns):
+				in_pattern = pattern_of == p
+				# Fully wildcarded fields always match, so only masked fields are indexed
+				cols = np.flatnonzero(mask)
+				pattern_values = values[in_pattern][:, cols] & mask[cols]
+				patterns.append((cols, mask[cols], ExactIndex(pattern_values, ids[in_pattern])))
+
+		compiled = {}
+		for table, entries in tables.items():
+			compiled[table] = self.compile_table(entries, key_ids)
+
+		return {'patterns' : patterns, 'tables' : compiled}
+
+	def compile_table(self, entries, key_ids):
+		num = len(entries)
+		is_leaf = np.zeros(num, dtype=bool)
+		leaf = np.zeros(num, dtype=np.int64)
+		feature = np.zeros(num, dtype=np.int64)
+		constraint = np.zeros(num, dtype=np.int64)
+		result = np.full(num, -1, dtype=np.int64)
+		priority = np.zeros(num, dtype=np.int64)
+		entry_of_key = np.full(len(key_ids), -1, dtype=np.int64)
+		for i, (action, keys, params) in enumerate(entries):
+			if action == 'set_leaf':
+				is_leaf[i] = True
+				leaf[i] = params[0]
+			else:
+				feature[i] = int(set_action_re.match(action).group(3)) - 1
+				constraint[i] = params[-1]
+				if len(params) == 2:
+					result[i] = params[0]
+
+			if not self.is_sram:
+				priority[i] = keys[-1]
+				keys = keys[:-1]
+			# Duplicate keys keep the first installed entry
+			if entry_of_key[key_ids[keys]] == -1:
+				entry_of_key[key_ids[keys]] = i
+
+		return {
+			'entry_of_key' : entry_of_key,
+			'priority' : priority,
+			'is_leaf' : is_leaf,
+			'leaf' : leaf,
+			'feature' : feature,
+			'constraint' : constraint,
+			'result' : result,
+		}
+
+	def lookup_layer(self, layer, key_cols):
+		n = len(key_cols[0])
+		hits = []
+		for cols, masks, index in layer['patterns']:
+			if cols is None:
+				hits.append(index.lookup(key_cols, n))
+			else:
+				hits.append(index.lookup([key_cols[c] if m == FEATURE_MASK else key_cols[c] & m for c, m in zip(cols, masks)], n))
+
+		# When no row matches more than one key, priorities never need resolving
+		if len(hits) > 1:
+			num_hits = np.zeros(n, dtype=np.int64)
+			for hit in hits:
+				num_hits += hit >= 0
+			if num_hits.max() <= 1:
+				return [np.max(hits, axis=0)]
+		return hits
+
+	def match(self, table, hits):
+		best = None
+		for hit in hits:
+			entry = np.where(hit >= 0, table['entry_of_key'][hit], -1)
+			if best is None:
+				best = entry
+				continue
+
+			# Lower priority value wins, then the entry installed first
+			priority = table['priority']
+			better = (entry != -1) & ((best == -1) | (priority[entry] < priority[best]) |
+				((priority[entry] == priority[best]) & (entry < best)))
+			best = np.where(better, entry, best)
+
+		return best
+
+	def apply_table(self, layer, name, hits, state, alu_target):
+		if name not in layer['tables']:
+			return
+
+		table = layer['tables'][name]
+		hit = self.match(table, hits)
+		rows = np.flatnonzero(hit != -1)
+		entry = hit[rows]
+
+		leaf_rows = table['is_leaf'][entry]
+		state['leaf'][rows[leaf_rows]] = table['leaf'][entry[leaf_rows]]
+
+		rows = rows[~leaf_rows]
+		entry = entry[~leaf_rows]
+		if alu_target is not None:
+			alu_input, a = alu_target
+			value = state['features'][rows, table['feature'][entry]] + table['constraint'][entry]
+			state[alu_input][rows, a] = value & self.alu_mask
+
+		with_result = table['result'][entry] != -1
+		layer_id = int(name.split('_')[1])
+		if layer_id > 1 and with_result.any():
+			state['layer_result'][rows[with_result], layer_id - 2] = table['result'][entry[with_result]]
+
+	def layer_keys(self, layer_id, state, final):
+		keys = []
+		if layer_id == 1:
+			return [state['tree_id']]
+
+		if self.transient and layer_id == 2 and not final:
+			keys.append(state['tree_id'])
+		if layer_id > 2:
+			keys.append(state['layer_result'][:, layer_id - 3])
+
+		if self.is_sram:
+			alu_keys = state['alu_result']
+		elif layer_id % 2 == 0:
+			alu_keys = state['alu_input']
+		else:
+			alu_keys = state['alu_input_B']
+
+		for a in range(self.alu_config[layer_id - 2]):
+			keys.append(alu_keys[:, a])
+		return keys
+
+	def run(self, features, tree_id=0):
+		if self.saturation is not None:
+			features = np.minimum(np.maximum(np.asarray(features, dtype=np.int64), 0), self.saturation)
+		else:
+			features = np.asarray(features, dtype=np.int64) & FEATURE_MASK
+		n = len(features)
+		state = {
+			'features' : features,
+			'tree_id' : np.full(n, tree_id, dtype=np.int64),
+			'leaf' : np.zeros(n, dtype=np.int64),
+			'layer_result' : np.zeros((n, max(self.num_layers - 1, 1)), dtype=np.int64),
+			'alu_input' : np.zeros((n, self.num_alus), dtype=np.int64),
+			'alu_input_B' : np.zeros((n, self.num_alus), dtype=np.int64),
+			'alu_result' : np.zeros((n, self.num_alus), dtype=np.int64),
+		}
+
+		for l in range(1, self.num_layers + 1):
+			if self.is_sram or l % 2 == 1:
+				alu_input = 'alu_input'
+			else:
+				alu_input = 'alu_input_B'
+
+			if l in self.layers:
+				layer = self.layers[l]
+				hits = self.lookup_layer(layer, self.layer_keys(l, state, False))
+				for a in range(self.alu_config[l - 1]):
+					self.apply_table(layer, 'layer_' + str(l) + '_' + str(a + 1), hits, state, (alu_input, a))
+
+			if self.is_sram:
+				state['alu_result'] = state['alu_input'] & self.sign_bit
+
+		if self.num_layers + 1 in self.layers:
+			layer = self.layers[self.num_layers + 1]
+			hits = self.lookup_layer(layer, self.layer_keys(self.num_layers + 1, state, True))
+			self.apply_table(layer, 'layer_' + str(self.num_layers + 1) + '_1', hits, state, None)
+		return state['leaf']
+
+def leo_sram_sim(alu_config, num_features, transient, rules, feature_widths=None):
+	return LeoPipeline(True, alu_config, num_features, 0, transient, rules, feature_widths)
+
+def leo_tcam_sim(alu_config, num_features, leaf_limit, transient, rules, feature_widths=None):
+	return LeoPipeline(False, alu_config, num_features, leaf_limit, transient, rules, feature_widths)
+
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program replays feature vectors through a software model of the generated Leo pipeline and compares it to the decision tree.')
+
+	grouped_args = parser.add_mutually_exclusive_group(required=True)
+	grouped_args.add_argument('--sram', action='store_true', help='Use SRAM memory.')
+	grouped_args.add_argument('--tcam', action='store_true', help='Use TCAM memory.')
+
+	parser.add_argument('--input_filename', type=str, required=True, help='The decision tree exported by scikit-learn\'s export_text(...).')
+	parser.add_argument('--data_filename', type=str, default=None, help='CSV of feature vectors with a header naming the tree features (Random vectors if excluded).')
+	parser.add_argument('--samples', type=int, default=1000000, help='Number of random feature vectors when no data file is given.')
+	parser.add_argument('--sub_tree', type=int, help='Depth of sub-tree (2 = 3 nodes in a layer, 3 = 7 nodes in a layer, etc.)')
+	parser.add_argument('--depth', type=int, help='The depth of the tree class (Excluding leaf layer).')
+	parser.add_argument('--muxed_alu_config', type=args_type_for_number_list, help='A comma-separated list of the number of Muxed ALUs in each layer (E.g.: 7,3,3,1). Replaces --sub_tree and --depth.')
+	parser.add_argument('--features', type=int, required=True, help='The number of features supported in the tree class.')
+	parser.add_argument('--feature_widths', type=args_type_for_number_list, help='A comma-separated list of the width in bits of every feature (Default: 16 bits for every feature).')
+	parser.add_argument('--leaf_limit', type=int, default=0, help='If the tree class has a limit on the number of leaves (Exclude this argument if no limit).')
+	parser.add_argument('--transient', action='store_true', help='Enable support for transient state during runtime tree updates.')
+	args = parser.parse_args()
+
+	if args.muxed_alu_config is not None:
+		alu_config = args.muxed_alu_config
+	elif args.sub_tree is not None and args.depth is not None:
+		alu_config = uniform_alu_config(args.sub_tree, args.depth)
+	else:
+		parser.error('either --muxed_alu_config or both --sub_tree and --depth are required')
+
+	subtree_layer_limits = leo_model(alu_config, False, False)[:-1]
+
+	tree = build_tree_from_file(args.input_filename)
+	if len(tree.feature_names) > args.features:
+		print('Error: The tree uses', len(tree.feature_names), 'features but the tree class supports', args.features)
+		return
+
+	feature_widths = feature_widths_or_default(args.features, args.feature_widths)
+	feature_slots = list(range(len(tree.feature_names)))
+	if len(set(feature_widths)) > 1:
+		feature_slots = assign_feature_slots(tree, feature_widths)
+		if feature_slots is None:
+			print('Error: The thresholds of the tree features do not fit the feature widths', feature_widths)
+			return
+
+	layers = assign_rule_to_layers(tree, sub_tree_splitter(tree, alu_config), subtree_layer_limits)
+	if layers is None:
+		return
+	rules = generate_rules(tree, layers, alu_config, args.sram, args.transient, sign_bit=alu_sign_bit(feature_widths), feature_slots=feature_slots)
+
+	if args.sram:
+		pipeline = leo_sram_sim(alu_config, args.features, args.transient, rules, feature_widths)
+	else:
+		pipeline = leo_tcam_sim(alu_config, args.features, args.leaf_limit, args.transient, rules, feature_widths)
+
+	if args.data_filename is not None:
+		X = np.genfromtxt(args.data_filename, delimiter=',', names=True)
+		X = np.stack([X[name] for name in tree.feature_names], axis=1).astype(np.int64)
+	else:
+		# Spread values around the tree's thresholds, below the ALU sign bit
+		upper = min(alu_sign_bit(feature_widths), 2 * int(tree.constraint.max()) + 2)
+		X = np.random.default_rng(0).integers(0, upper, size=(args.samples, len(tree.feature_names)))
+
+	features = np.zeros((len(X), args.features), dtype=np.int64)
+	features[:, feature_slots] = X
+
+	start = time.perf_counter()
+	leaves = pipeline.run(features)
+	elapsed = time.perf_counter() - start
+
+	expected = tree.predict(X)
+	mismatches = int(np.count_nonzero(leaves != expected))
+	print('Flows:', len(X), '| Mismatches:', mismatches, '| Flows/sec: {:.0f}'.format(len(X) / elapsed))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,123 @@
+from leo_ctrlplane_generator import Tree, sub_tree_splitter
+
+import argparse
+import numpy as np
+
+# The splitter before it ran in linear time, copied verbatim with its node classes
+
+class InternalNode:
+	def __init__(self, feature, constraint, depth):
+		self.feature = feature
+		self.constraint = constraint
+		self.depth = depth
+		self.left = None
+		self.right = None
+
+class LeafNode:
+	def __init__(self, label, depth):
+		self.label = label
+		self.depth = depth
+
+def find_k_children(node, k):
+	children = []
+	queue = [node]
+	while len(queue) > 0:
+		cur_node = queue.pop(0)
+		children.append(cur_node)
+		if len(children) == k:
+			break
+
+		if type(cur_node.left) == InternalNode:
+			queue.append(cur_node.left)
+
+		if type(cur_node.right) == InternalNode:
+			queue.append(cur_node.right)
+
+	return children
+
+def baseline_sub_tree_splitter(root, K):
+	bfs_sorted_nodes = []
+
+	bfs_queue = [root]
+	while len(bfs_queue) > 0:
+		node = bfs_queue.pop(0)
+		bfs_sorted_nodes.append(node)
+
+		if type(node.left) == InternalNode:
+			bfs_queue.append(node.left)
+		if type(node.right) == InternalNode:
+			bfs_queue.append(node.right)
+
+	sub_groups = []
+	while len(bfs_sorted_nodes) > 0:
+		node = bfs_sorted_nodes[0]
+		children = find_k_children(node, K)
+		sub_groups.append(children)
+		for c in children:
+			bfs_sorted_nodes.remove(c)
+
+	return sub_groups
+
+def random_tree(rng, internal_nodes):
+	# Splits a random leaf until the tree has the requested number of internal nodes
+	left = [-1]
+	right = [-1]
+	depth = [1]
+	leaves = [0]
+	for i in range(internal_nodes):
+		node = leaves.pop(rng.randint(len(leaves)))
+		for children in (left, right):
+			children[node] = len(left)
+			left.append(-1)
+			right.append(-1)
+			depth.append(depth[node] + 1)
+			leaves.append(children[node])
+
+	left = np.array(left)
+	feature = np.where(left == -1, -1, rng.randint(0, 4, len(left)))
+	constraint = np.where(left == -1, 0, rng.randint(0, 1000, len(left)))
+	label = np.where(left == -1, rng.randint(0, 3, len(left)), -1)
+	return Tree(feature, constraint, left, right, depth, label, ['f0', 'f1', 'f2', 'f3'])
+
+def object_tree(tree):
+	# The same tree as node objects, and the index of every internal node object
+	nodes = []
+	index = {}
+	for n in range(tree.num_nodes()):
+		if tree.is_leaf(n):
+			nodes.append(LeafNode(int(tree.label[n]), int(tree.depth[n])))
+		else:
+			nodes.append(InternalNode(int(tree.feature[n]), int(tree.constraint[n]), int(tree.depth[n])))
+			index[id(nodes[-1])] = n
+	for n in range(tree.num_nodes()):
+		if not tree.is_leaf(n):
+			nodes[n].left = nodes[tree.left[n]]
+			nodes[n].right = nodes[tree.right[n]]
+	return nodes[tree.root], index
+
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program checks that sub_tree_splitter forms the same sub-trees as the splitter it replaced, on random trees.')
+
+	parser.add_argument('--trees', type=int, default=400, help='Number of random trees (Default: 400).')
+	parser.add_argument('--max_nodes', type=int, default=300, help='Largest number of internal nodes of a tree (Default: 300).')
+	parser.add_argument('--max_k', type=int, default=15, help='Largest number of nodes per sub-tree (Default: 15).')
+	parser.add_argument('--seed', type=int, default=0, help='Seed of the random trees (Default: 0).')
+	args = parser.parse_args()
+
+	rng = np.random.RandomState(args.seed)
+	for i in range(args.trees):
+		tree = random_tree(rng, rng.randint(1, args.max_nodes + 1))
+		K = rng.randint(1, args.max_k + 1)
+		# Every layer has K ALUs, as the previous splitter assumed
+		alu_config = [K] * (int(tree.depth.max()) + 1)
+
+		root, index = object_tree(tree)
+		expected = [[index[id(node)] for node in group] for group in baseline_sub_tree_splitter(root, K)]
+		groups = [list(group) for group in sub_tree_splitter(tree, alu_config)]
+		assert groups == expected, 'tree ' + str(i) + ' (K = ' + str(K) + '): the sub-trees differ'
+
+	print('Identical sub-trees on', args.trees, 'random trees')
+
+if __name__ == '__main__':
+	main()
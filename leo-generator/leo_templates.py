@@ -1,34 +1,51 @@
+import functools
 from string import Template
 
+DEFAULT_FEATURE_WIDTH = 16
+
+def feature_widths_or_default(num_features, feature_widths):
+	if feature_widths is None:
+		return [DEFAULT_FEATURE_WIDTH] * num_features
+	return list(feature_widths)
+
+# The ALUs add a feature and a constraint and keep the top bit, so they are as wide as the widest feature
+def alu_sign_bit(feature_widths):
+	return 1 << (max(feature_widths) - 1)
+
+def feature_cast(width, feature_widths):
+	if width < max(feature_widths):
+		return '(bit<FEATURE_WIDTH>)'
+	return ''
+
 stateless_AND_alu_T = Template('''
 	action ALU_${alu}_and() {
-		hdr.leo.alu_${alu}_result = hdr.leo.alu_${alu}_input & 32768;
+		hdr.leo.alu_${alu}_result = hdr.leo.alu_${alu}_input & ${sign_bit};
 	}
 ''')
 
 mux_action_decl_with_result_t = Template('''
 	action set_${layer}_${alu}_feature${feature}(bit<LEAF_ID_WIDTH> result, bit<FEATURE_WIDTH> constraint) {
 		hdr.leo.layer_${layer_prev}_result = result;
-		hdr.leo.alu_${alu}_input = hdr.leo.feature_${feature} + constraint;
+		hdr.leo.alu_${alu}_input = ${cast}hdr.leo.feature_${feature} + constraint;
 	}
 ''')
 
 mux_action_alt_decl_with_result_t = Template('''
 	action set_${layer}_${alu}_feature${feature}(bit<LEAF_ID_WIDTH> result, bit<FEATURE_WIDTH> constraint) {
 		hdr.leo.layer_${layer_prev}_result = result;
-		hdr.leo.alu_${alu}_input_B = hdr.leo.feature_${feature} + constraint;
+		hdr.leo.alu_${alu}_input_B = ${cast}hdr.leo.feature_${feature} + constraint;
 	}
 ''')
 
 mux_action_decl_t = Template('''
 	action set_${layer}_${alu}_feature${feature}(bit<FEATURE_WIDTH> constraint) {
-		hdr.leo.alu_${alu}_input = hdr.leo.feature_${feature} + constraint;
+		hdr.leo.alu_${alu}_input = ${cast}hdr.leo.feature_${feature} + constraint;
 	}
 ''')
 
 mux_action_alt_decl_t = Template('''
 	action set_${layer}_${alu}_feature${feature}(bit<FEATURE_WIDTH> constraint) {
-		hdr.leo.alu_${alu}_input_B = hdr.leo.feature_${feature} + constraint;
+		hdr.leo.alu_${alu}_input_B = ${cast}hdr.leo.feature_${feature} + constraint;
 	}
 ''')
 
@@ -50,8 +67,13 @@ mux_action_t = Template('''
 mux_key_t = Template('''
 			hdr.leo.${key_name} : ${table_type};''')
 
+# Key lines repeat in every table of a layer, render each one once
+@functools.lru_cache(maxsize=None)
+def mux_key(key_name, table_type):
+	return mux_key_t.substitute({'key_name' : key_name, 'table_type' : table_type})
+
 custom_header_t = Template('''
-#define FEATURE_WIDTH 16
+#define FEATURE_WIDTH ${feature_width}
 #define LEAF_ID_WIDTH 16
 
 header leo_hdr_t {
@@ -412,24 +434,42 @@ control SwitchIngress(
 }
 '''
 
-clear_table_t = Template('''bfrt.Leo.pipe.SwitchEngress.layer_${layer_id}_${alu}.clear()''')
+clear_table_t = Template('''bfrt.Leo.pipe.SwitchEgress.layer_${layer_id}_${alu}.clear()
+''')
+
+batch_begin = '''bfrt.batch_begin()
+'''
 
-add_tcam_entry_layer_1 = Template('''
-	bfrt.usman.pipe.SwitchIngress.layer_1_${alu}.add_with_set_1_${alu}_feature${feature}(${tree_id},0xffff,0,${constraint})
+batch_end = '''bfrt.batch_end()
+'''
+
+add_entries_t = Template('''
+table = bfrt.Leo.pipe.SwitchEgress.${table}
+for entry in [${entries}]:
+	table.add_with_${action}(*entry)
+''')
+
+mod_entries_t = Template('''
+table = bfrt.Leo.pipe.SwitchEgress.${table}
+for entry in [${entries}]:
+	table.mod_with_${action}(*entry)
 ''')
 
-add_tcam_entry_with_prev_result_set_only = Template('''
-	bfrt.usman.pipe.SwitchIngress.layer_${layer}_${alu}.add_with_set_${layer}_${alu}_feature${feature}(${keys_and_masks},0,${result},${constraint})
+delete_entries_t = Template('''
+table = bfrt.Leo.pipe.SwitchEgress.${table}
+for entry in [${entries}]:
+	table.delete(*entry)
 ''')
 
-add_tcam_entry_with_prev_result_match_and_set = Template('''
-	bfrt.usman.pipe.SwitchIngress.layer_${layer}_${alu}.add_with_set_${layer}_${alu}_feature${feature}(${prev_layer_result},0xffff,${keys_and_masks},0,${constraint},${result})
+change_active_tree_t = Template('''
+bfrt.Leo.pipe.SwitchIngress.tree_id_table.set_default_with_change_active_tree(${tree_id})
 ''')
 
-add_tcam_entry_with_prev_result_match_only = Template('''
-	bfrt.usman.pipe.SwitchIngress.layer_${layer}_${alu}.add_with_set_${layer}_${alu}_feature${feature}(${prev_layer_result},0xffff,${keys_and_masks},0,${constraint})
+feature_mapping_t = Template('''hdr.leo.feature_${feature} = ${name}
 ''')
 
-add_tcam_entry_with_leaf = Template('''
-	bfrt.usman.pipe.SwitchIngress.layer_${layer}_${alu}.add_with_set_${layer}_${alu}_feature${feature}(${prev_layer_result},0xffff,${keys_and_masks},0,${constraint})
-''')
\ No newline at end of file
+feature_segment_t = Template('''hdr.leo.feature_${feature} = ${base} + (${name} >> ${shift}) if ${condition}
+''')
+
+feature_clip_t = Template('''hdr.leo.feature_${feature} = ${max} if ${name} >= ${limit}
+''')
@@ -0,0 +1,148 @@
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import leo_path
+from leo_resource_model import leo_model, leo_model_cached
+
+FEATURE_WIDTH = 16
+LEAF_ID_WIDTH = 16
+
+def alu_config_of(config):
+	return tuple((2 ** s) - 1 for s in config)
+
+def layer_sizes(config, args):
+	# Entries of every layer of a configuration of sub-tree depths, leaf layer last
+	return leo_model_cached(alu_config_of(config), args.is_sram, args.transient, args.leaf_limit)[1]
+
+def explore_from(prefix, max_layers, args):
+	# Dynamic program over the layers after the prefix. A layer's size only depends on the depth covered
+	# before it and the sub-tree of the layer before, so each (depth, sub_tree) state keeps the cheapest
+	# configuration. Returns the cheapest complete configuration for every depth reached.
+	sizes = layer_sizes(prefix, args)[:-1]
+	if max(sizes) > args.stage_budget:
+		return {}
+
+	states = {(sum(prefix), prefix[-1]): (sum(sizes), max(sizes), prefix)}
+	best = {}
+	for num_layers in range(len(prefix), max_layers + 1):
+		next_states = {}
+		for (depth, last), (memory, max_stage, config) in states.items():
+			leaf_size = layer_sizes(config, args)[-1]
+			if leaf_size <= args.stage_budget:
+				total = memory + leaf_size
+				if depth not in best or total < best[depth][0]:
+					best[depth] = (total, max(max_stage, leaf_size), config)
+
+			# Depth beyond the target is never needed, and the last stage is kept for the leaf layer
+			if args.target_depth and depth >= args.target_depth:
+				continue
+			if num_layers == max_layers:
+				continue
+
+			for sub_tree in range(1, args.max_sub_tree + 1):
+				size = layer_sizes(config + (sub_tree,), args)[-2]
+				if size > args.stage_budget:
+					# Layer sizes grow with the sub-tree
+					break
+				state = (depth + sub_tree, sub_tree)
+				candidate = (memory + size, max(max_stage, size), config + (sub_tree,))
+				if state not in next_states or candidate[0] < next_states[state][0]:
+					next_states[state] = candidate
+		states = next_states
+		if not states:
+			break
+
+	return best
+
+def search_prefixes(args):
+	# One task per single-layer configuration and one per configuration of the first two layers, so the
+	# work spreads over more workers than there are first layers.
+	max_layers = args.stages - 1
+	prefixes = []
+	for first in range(1, args.max_sub_tree + 1):
+		prefixes.append(((first,), 1))
+		# A first layer already at the target depth is not extended
+		if max_layers > 1 and not (args.target_depth and first >= args.target_depth):
+			for second in range(1, args.max_sub_tree + 1):
+				prefixes.append(((first, second), max_layers))
+	return prefixes
+
+def tie_key(result):
+	total, max_stage, config = result
+	return (total, config[0], len(config))
+
+def pareto_frontier(results):
+	# Deepest first, keep a configuration only if it uses less memory than every deeper one
+	frontier = []
+	for depth in sorted(results, reverse=True):
+		if not frontier or results[depth][0] < frontier[-1][1][0]:
+			frontier.append((depth, results[depth]))
+	frontier.reverse()
+	return frontier
+
+def header_bits(num_layers, num_alus, num_features):
+	return (num_layers - 1) * LEAF_ID_WIDTH + 2 * num_alus * FEATURE_WIDTH + num_features * FEATURE_WIDTH
+
+def main():
+	parser = argparse.ArgumentParser(
+		description='This program searches for Muxed ALU configurations that fit a switch budget and prints the Pareto frontier of tree depth versus memory.')
+
+	grouped_args = parser.add_mutually_exclusive_group(required=True)
+	grouped_args.add_argument('--sram', action='store_true', help='Use SRAM memory.')
+	grouped_args.add_argument('--tcam', action='store_true', help='Use TCAM memory.')
+
+	parser.add_argument('--stages', type=int, required=True, help='The number of switch stages available (one per layer, including the leaf layer).')
+	parser.add_argument('--stage_budget', type=int, required=True, help='The number of table entries available in a single stage.')
+	parser.add_argument('--features', type=int, required=True, help='The number of features supported in the tree class.')
+	parser.add_argument('--depth', type=int, default=0, help='The target depth of the tree class (Excluding leaf layer).')
+	parser.add_argument('--leaf_limit', type=int, default=0, help='If the tree class has a limit on the number of leaves (Exclude this argument if no limit). Without --depth, the target depth is the smallest one holding this many leaves.')
+	parser.add_argument('--max_sub_tree', type=int, default=4, help='The largest sub-tree depth a single layer may hold (4 = 15 Muxed ALUs).')
+	parser.add_argument('--transient', action='store_true', help='Include the additional cost of supporting transient state during runtime tree updates.')
+	parser.add_argument('--workers', type=int, default=os.cpu_count(), help='The number of worker processes.')
+	args = parser.parse_args()
+
+	args.is_sram = args.sram
+	args.target_depth = args.depth
+	if not args.target_depth and args.leaf_limit:
+		args.target_depth = int(math.ceil(math.log2(args.leaf_limit)))
+	# Leo-SRAM tables are not bounded by the number of leaves
+	if args.is_sram:
+		args.leaf_limit = 0
+
+	if args.stages < 2:
+		print('Error: at least 2 stages are needed (one layer and the leaf layer).')
+		return
+
+	results = {}
+	with ProcessPoolExecutor(max_workers=args.workers) as pool:
+		futures = [pool.submit(explore_from, prefix, max_layers, args) for prefix, max_layers in search_prefixes(args)]
+		for future in futures:
+			for depth, result in future.result().items():
+				# Among equally cheap configurations, the smaller first layer and then the fewer layers win
+				if depth not in results or tie_key(result) < tie_key(results[depth]):
+					results[depth] = result
+
+	if not results:
+		print('No configuration fits the stage budget.')
+		return
+
+	print('{:>6}  {:>16}  {:>7}  {:>18}  {:>14}  {:>12}'.format('Depth', 'Muxed ALU Config', 'Stages', 'Max Stage Entries', 'Total Entries', 'Header Bits'))
+	for depth, (total, max_stage, config) in pareto_frontier(results):
+		alus = list(alu_config_of(config))
+		print('{:>6}  {:>16}  {:>7}  {:>18}  {:>14}  {:>12}'.format(depth, ','.join(str(a) for a in alus), len(config) + 1, max_stage, total, header_bits(len(config), max(alus), args.features)))
+
+	if args.target_depth:
+		feasible = [depth for depth in results if depth >= args.target_depth]
+		if feasible:
+			depth = min(feasible, key=lambda d: results[d][0])
+			alus = list(alu_config_of(results[depth][2]))
+			print('Cheapest config for depth', args.target_depth, ':', ','.join(str(a) for a in alus))
+			if not args.leaf_limit:
+				leo_model(alus, args.is_sram, args.transient, True)
+		else:
+			print('No configuration reaches depth', args.target_depth, '- the deepest supported is', max(results))
+
+if __name__ == '__main__':
+	main()
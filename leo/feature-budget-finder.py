@@ -1,22 +1,104 @@
-def main():
-    NUM_FEATURES = 9
-    BITS_BUDGET = 57
-    
-    print('NUM FEATURES =', NUM_FEATURES, '| BITS BUDGET =', BITS_BUDGET)
+import argparse
+
+import leo_path
+from leo_resource_model import uniform_alu_config, args_type_for_number_list
+from leo_ctrlplane_generator import build_tree_from_file, feature_capacity
+from leo_quantization import load_quantization, quantize_tree
+
+def width_combinations(num_features, bits_budget, wide, narrow):
+    # Without a tree: the best mix of wide and narrow features for every number of wide features
+    print('NUM FEATURES =', num_features, '| BITS BUDGET =', bits_budget)
     print('---')
-    
-    for i in range(NUM_FEATURES, -1, -1):
+
+    for i in range(num_features, -1, -1):
         max_use = 0
         max_config = None
-        for j in range(0, NUM_FEATURES + 1):
-            bits_used = (16 * i) + (8 * j)
-            if i + j <= NUM_FEATURES: 
-                if bits_used <= BITS_BUDGET:
+        for j in range(0, num_features + 1):
+            bits_used = (wide * i) + (narrow * j)
+            if i + j <= num_features:
+                if bits_used <= bits_budget:
                     if bits_used > max_use:
                         max_use = bits_used
                         max_config = (i, j)
-        if max_use:          
-            print('16-bit x', max_config[0], '| 8-bit x ', max_config[1], '| Use =', max_use, '/', BITS_BUDGET)
+        if max_use:
+            print(str(wide) + '-bit x', max_config[0], '| ' + str(narrow) + '-bit x ', max_config[1], '| Use =', max_use, '/', bits_budget)
+
+def tree_thresholds(tree):
+    # The largest threshold of every tree feature, -1 if it only has negative ones
+    largest = [-1] * len(tree.feature_names)
+    for f, c in zip(tree.feature.tolist(), tree.constraint.tolist()):
+        if f != -1:
+            largest[f] = max(largest[f], c)
+    return largest
+
+def narrowest_widths(largest, widths, alu_width):
+    # The narrowest candidate width of every feature, for ALUs of alu_width bits
+    candidates = sorted(w for w in widths if w <= alu_width)
+    feature_widths = []
+    for t in largest:
+        fits = [w for w in candidates if t <= feature_capacity(w, [alu_width])]
+        if len(fits) == 0:
+            return None
+        feature_widths.append(fits[0])
+
+    # The widest feature sets the ALU width, so one feature has to be that wide
+    if max(feature_widths) < alu_width:
+        return None
+    return feature_widths
+
+def optimize_widths(largest, widths, num_alus):
+    # Every ALU width is tried, the header bits are the features and two fields per ALU
+    best = None
+    for alu_width in sorted(set(widths)):
+        feature_widths = narrowest_widths(largest, widths, alu_width)
+        if feature_widths is None:
+            continue
+        bits = sum(feature_widths) + 2 * num_alus * alu_width
+        if best is None or bits < best[0]:
+            best = (bits, feature_widths)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='This program selects the width of every Leo feature under a budget of header bits.')
+    parser.add_argument('--features', type=int, default=9, help='The number of features, without a tree (Default: 9).')
+    parser.add_argument('--bits_budget', type=int, default=57, help='The header bits available to the features (and ALUs if a tree class is given).')
+    parser.add_argument('--widths', type=args_type_for_number_list, default=[16, 8], help='The comma-separated candidate feature widths (Default: 16,8).')
+    parser.add_argument('--input_filename', type=str, help='A decision tree exported by scikit-learn\'s export_text(...). Widths are chosen from the range of its thresholds.')
+    parser.add_argument('--quantization', type=str, help='The feature quantization of the tree, as given to leo_ctrlplane_generator.py.')
+    parser.add_argument('--sub_tree', type=int, help='Depth of sub-tree, to count the ALU fields in the budget.')
+    parser.add_argument('--depth', type=int, help='The depth of the tree class, to count the ALU fields in the budget.')
+    parser.add_argument('--muxed_alu_config', type=args_type_for_number_list, help='A comma-separated list of the number of Muxed ALUs in each layer. Replaces --sub_tree and --depth.')
+    args = parser.parse_args()
+
+    widths = sorted(set(args.widths), reverse=True)
+    if args.input_filename is None:
+        width_combinations(args.features, args.bits_budget, widths[0], widths[-1])
+        return
+
+    num_alus = 0
+    if args.muxed_alu_config is not None:
+        num_alus = max(args.muxed_alu_config)
+    elif args.sub_tree is not None and args.depth is not None:
+        num_alus = max(uniform_alu_config(args.sub_tree, args.depth))
+
+    tree = build_tree_from_file(args.input_filename)
+    if args.quantization is not None:
+        quantize_tree(tree, load_quantization(args.quantization)['features'])
+
+    largest = tree_thresholds(tree)
+    best = optimize_widths(largest, widths, num_alus)
+    if best is None:
+        print('Error: Some thresholds do not fit', widths[0], 'bit features, quantize the tree first')
+        return
+
+    bits, feature_widths = best
+    for name, t, w in zip(tree.feature_names, largest, feature_widths):
+        print('{:>30}  largest threshold {:>8}  {:>3}-bit'.format(name, t, w))
+    print('Use =', bits, '/', args.bits_budget, '(' + str(2 * num_alus * max(feature_widths)), 'bits of ALU fields)')
+    print('--feature_widths', ','.join(str(w) for w in feature_widths))
+    if bits > args.bits_budget:
+        print('Error: The tree needs', bits - args.bits_budget, 'more bits, quantize its widest features to fewer bits')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
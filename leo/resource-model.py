@@ -1,61 +1,7 @@
 import argparse
 
-def leo_model(alu_config, is_sram, transient, log=False):
-	num_alu_layers = len(alu_config)
-	single_table_sizes = []
-
-	total_size = 0
-	curr_layer_result_combos = 1
-	prev_layer_tcam = 1
-	curr_layer_tcam = 1
-
-	if log:
-		print('{:>12}  {:>12}  {:>12}'.format('Layer #', 'Single Table Size', 'Total Layer Size'))
-	for l in range(1, num_alu_layers + 2):
-		if l == num_alu_layers + 1:
-			num_mux_next_layer = 1
-		else:
-			num_mux_next_layer = alu_config[l - 1]
-
-		if l > 1:
-			curr_layer_tcam = alu_config[l - 2] + 1
-			if is_sram:
-				curr_layer_result_combos = 2 ** alu_config[l - 2]
-			else:
-				curr_layer_result_combos = curr_layer_tcam
-					
-		single_table_size = curr_layer_result_combos * prev_layer_tcam
-		layer_size = single_table_size * num_mux_next_layer
-		if transient:
-			layer_size = layer_size * 2
-			single_table_size = single_table_size * 2
-
-		total_size += layer_size
-
-		single_table_sizes.append(single_table_size)
-		if log:
-			print('{:>12}  {:>12}  {:>12}'.format(l, single_table_size, layer_size))
-
-		prev_layer_tcam = curr_layer_tcam * prev_layer_tcam
-
-	if log:
-		print('Total Size:', total_size)
-	return single_table_sizes
-
-# Rules in layer i of LEO
-def R_i(i, L, R, K):
-	if i == 1:
-		return 1
-	if L != 0:
-		return min(L, R[i-1] * (K[i] + 1))
-	else:
-		return R[i-1] * (K[i] + 1)
-
-def args_type_for_number_list(arg):
-    try:
-        return [int(num) for num in arg.split(',')]
-    except ValueError:
-        raise argparse.ArgumentTypeError('Invalid list of integers: "{}"'.format(arg))
+import leo_path
+from leo_resource_model import leo_model, leo_model_vec, R_i, args_type_for_number_list
 
 if __name__ == '__main__':
 	parser = argparse.ArgumentParser(